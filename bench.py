@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Benchmarks for loglint.
+
+Usage: python bench.py [-n RUNS] [FILE]
+       python bench.py --runtime-hook [--threads N] [--calls N]
+       python bench.py --engines [-n RUNS] [FILE...]
+
+By default reports the median wall time of importing loglint and of a
+complete run of the loglint_cli.py entry point over FILE (example.py by
+default) against the startup target, and the time the import statement
+itself takes, measured inside a fresh interpreter so that it works on
+any Python.  A command that fails stops the benchmark.
+
+With --runtime-hook, measures the per call overhead of the
+loglint_runtime hook with several threads logging concurrently.
+
+With --engines, compares the time the token and fast engines take to
+check the FILEs (loglint.py and tests.py by default) in process.
+"""
+
+import logging
+import optparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOGLINT = os.path.join(HERE, "loglint.py")
+ENTRY_POINT = os.path.join(HERE, "loglint_cli.py")
+
+# Wall time budget for linting a single small file, in seconds.
+STARTUP_TARGET = 0.050
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def run_checked(argv, ok_statuses=(0,)):
+    # Anything on stderr means a traceback or a bad command line, which
+    # would otherwise be timed as if it were the real thing.
+    proc = subprocess.Popen(argv,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE,
+                            cwd=HERE)
+    out, err = proc.communicate()
+    if proc.returncode not in ok_statuses or err:
+        sys.stderr.write("%s exited with status %d:\n%s" %
+                         (" ".join(argv), proc.returncode,
+                          err.decode("utf-8", "replace")))
+        sys.exit(1)
+    return out
+
+
+def time_command(argv, runs, ok_statuses=(0,)):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        run_checked(argv, ok_statuses)
+        timings.append(time.time() - start)
+    return median(timings)
+
+
+IMPORT_TIMER = ("import time; start = time.time(); import loglint; "
+                "print(time.time() - start)")
+
+
+def import_statement_time(runs):
+    return median([float(run_checked([sys.executable, "-c", IMPORT_TIMER]))
+                   for _ in range(runs)])
+
+
+def generate_load(logger, threads, calls):
+    # Half the calls are at a disabled level, half are formatted.
+    def worker():
+        for index in range(calls):
+            logger.debug("disabled %s %s", index, threads)
+            logger.info("enabled %s %s", index, threads)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.time() - start
+
+
+def bench_runtime_hook(options):
+    import loglint_runtime
+
+    logger = logging.getLogger("loglint.bench")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    total_calls = options.threads * options.calls * 2
+
+    def per_call_us(elapsed):
+        return elapsed / total_calls * 1e6
+
+    baseline = median([generate_load(logger, options.threads, options.calls)
+                       for _ in range(options.runs)])
+    print("%d threads, %d calls each" % (options.threads, options.calls * 2))
+    print("no hook:            %6.2f us/call" % per_call_us(baseline))
+    for sample_every in [1, 10, 100, 1000]:
+        hook = loglint_runtime.install(sample_every)
+        try:
+            elapsed = median([generate_load(logger,
+                                            options.threads,
+                                            options.calls)
+                              for _ in range(options.runs)])
+        finally:
+            hook.uninstall()
+        print("sample 1/%-5d     %6.2f us/call (+%.2f)" %
+              (sample_every,
+               per_call_us(elapsed),
+               per_call_us(elapsed - baseline)))
+
+
+def bench_engines(options, filenames):
+    import loglint
+
+    sources = []
+    for filename in filenames:
+        with open(filename) as f:
+            sources.append((filename, f.read()))
+    size = sum(len(source) for _, source in sources)
+    print("%d files, %d bytes" % (len(sources), size))
+    baseline = None
+    for engine in ["token", "fast"]:
+        config = loglint.Config(engine=engine)
+        runner = loglint.RuleRunner.from_options(config)
+        timings = []
+        for _ in range(options.runs):
+            start = time.time()
+            for filename, source in sources:
+                loglint.lint_filelike(filename, loglint.StringIO(source),
+                                      config, runner=runner)
+            timings.append(time.time() - start)
+        elapsed = median(timings)
+        if baseline is None:
+            baseline = elapsed
+        print("%-6s %8.1f ms (%.1fx)" %
+              (engine, elapsed * 1000, baseline / elapsed))
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [-n RUNS] [FILE]")
+    parser.add_option("-n", "--runs", type="int", default=20,
+                      help="number of runs to take the median of")
+    parser.add_option("--runtime-hook", action="store_true",
+                      help="benchmark the loglint_runtime hook instead")
+    parser.add_option("--threads", type="int", default=8,
+                      help="threads generating log calls (--runtime-hook)")
+    parser.add_option("--calls", type="int", default=10000,
+                      help="calls per thread and level (--runtime-hook)")
+    parser.add_option("--engines", action="store_true",
+                      help="compare the token and fast engines instead")
+    options, args = parser.parse_args()
+
+    if options.runtime_hook:
+        bench_runtime_hook(options)
+        return
+
+    if options.engines:
+        bench_engines(options, args or [LOGLINT,
+                                        os.path.join(HERE, "tests.py")])
+        return
+
+    target = args[0] if args else os.path.join(HERE, "example.py")
+
+    baseline = time_command([sys.executable, "-c", "pass"], options.runs)
+    import_only = time_command([sys.executable, "-c", "import loglint"],
+                               options.runs)
+    # loglint exits with 1 when it finds errors.
+    full_run = time_command([sys.executable, ENTRY_POINT, target],
+                            options.runs, ok_statuses=(0, 1))
+    import_statement = import_statement_time(options.runs)
+
+    print("interpreter startup: %6.1f ms" % (baseline * 1000))
+    print("import loglint:      %6.1f ms" % (import_only * 1000))
+    print("lint %s: %6.1f ms (target %.0f ms, %s)" %
+          (os.path.basename(target), full_run * 1000, STARTUP_TARGET * 1000,
+           "met" if full_run < STARTUP_TARGET else "MISSED"))
+    print("import statement:    %6.1f ms" % (import_statement * 1000))
+    if os.environ.get("PYTHONDONTWRITEBYTECODE"):
+        print("PYTHONDONTWRITEBYTECODE is set, so loglint.py was compiled"
+              " on every run")
+
+
+if __name__ == '__main__':
+    main()
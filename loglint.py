@@ -1,12 +1,47 @@
 #!/usr/bin/env python
 
-import optparse
+# Only what every run needs is imported here.  Everything else
+# (optparse, logging, json, hashlib, multiprocessing) is imported where
+# it's used to keep startup fast when linting a couple of files.
 import tokenize
-import logging
+import fnmatch
+import itertools
+import keyword
+import re
+import stat
 import sys
+import time
 import os
 
-logger = logging.getLogger(__name__)
+from StringIO import StringIO
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# Only set up when debugging output is requested, see
+# enable_debug_logging().
+logger = None
+
+# Directories that are never worth descending into.
+DEFAULT_EXCLUDES = [".git",
+                    ".hg",
+                    ".svn",
+                    ".tox",
+                    ".nox",
+                    ".venv",
+                    "venv",
+                    "node_modules",
+                    "__pycache__",
+                    "*.egg-info"]
+
+NOTEBOOK_EXTENSIONS = (".ipynb",)
+
+SOURCE_EXTENSIONS = (".py",) + NOTEBOOK_EXTENSIONS
 
 # Not sure why 54 is not in token constants
 IGNORED_TOKENS = set([tokenize.INDENT,
@@ -14,10 +49,47 @@ IGNORED_TOKENS = set([tokenize.INDENT,
                       54])
 
 
+def count_format_specifiers(string):
+    count = 0
+    skip = False
+    for index in xrange(len(string)):
+        if skip:
+            skip = False
+        else:
+            try:
+                if string[index] == "%":
+                    if string[index + 1] == "%":
+                        skip = True
+                    else:
+                        count += 1
+            except IndexError:
+                pass
+    return count
+
+
+def format_mapping_keys(string):
+    """Return the keys of the %(name)s style specifiers in string."""
+    keys = []
+    index = string.find("%")
+    while index != -1 and index + 1 < len(string):
+        if string[index + 1] == "%":
+            index += 2
+        else:
+            if string[index + 1] == "(":
+                end = string.find(")", index)
+                if end != -1:
+                    keys.append(string[index + 2:end])
+                    index = end
+            index += 1
+        index = string.find("%", index)
+    return keys
+
+
 def get_next_token(tokens):
     while True:
         token = tokens.pop(0)
-        logger.debug("Token: %s" % (token,))
+        if logger is not None:
+            logger.debug("Token: %s", token)
         if token[0] not in IGNORED_TOKENS:
             break
     return token
@@ -26,7 +98,8 @@ def get_next_token(tokens):
 class Transition(object):
 
     def __init__(self, new_state_name, tokens, *args, **kwargs):
-        logger.debug("Transition: %s" % new_state_name)
+        if logger is not None:
+            logger.debug("Transition: %s", new_state_name)
         self.new_state_name = new_state_name
         self.tokens = tokens
         self.args = args
@@ -39,8 +112,205 @@ class Transition(object):
         return unicode(self).encode("utf-8")
 
 
+class Diagnostic(object):
+    """A single problem found in a logger statement."""
+
+    ERROR = "error"
+    WARNING = "warning"
+
+    def __init__(self, filename, line, severity, message, source_line,
+                 rule=None):
+        self.filename = filename
+        self.line = line
+        self.severity = severity
+        self.message = message
+        self.source_line = source_line
+        # Name of the rule that found it, None for problems with the
+        # file itself.
+        self.rule = rule
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["filename"],
+                   data["line"],
+                   data["severity"],
+                   data["message"],
+                   data["source_line"],
+                   data.get("rule"))
+
+    def as_dict(self):
+        return {"filename": self.filename,
+                "line": self.line,
+                "severity": self.severity,
+                "message": self.message,
+                "source_line": self.source_line,
+                "rule": self.rule}
+
+    def __repr__(self):
+        return "Diagnostic(%r, %r, %r, %r)" % (self.filename,
+                                               self.line,
+                                               self.severity,
+                                               self.message)
+
+    def format(self):
+        if self.line is None:
+            # Problems with the file as a whole.
+            return "%s: %s\nIn '%s'\n\n" % (self.severity.upper(),
+                                             self.message,
+                                             self.filename)
+        return ("%s: %s\nAt line %d of '%s':\n    %s\n\n" %
+                (self.severity.upper(),
+                 self.message,
+                 self.line,
+                 self.filename,
+                 self.source_line))
+
+
+class DiagnosticCounter(object):
+    """Writer wrapper counting the diagnostics, by severity, it passes on."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.counts = {}
+
+    def add_diagnostic(self, diagnostic):
+        self.counts[diagnostic.severity] = (
+            self.counts.get(diagnostic.severity, 0) + 1)
+        report_diagnostic(self.writer, diagnostic)
+
+    def add_file(self, filename, lines):
+        report_file(self.writer, filename, lines)
+
+    def write(self, text):
+        self.writer.write(text)
+
+
+class DiagnosticCollector(object):
+    """Writer replacement that keeps Diagnostic objects instead of text."""
+
+    def __init__(self):
+        self.diagnostics = []
+        self.lines = 0
+
+    def add_diagnostic(self, diagnostic):
+        self.diagnostics.append(diagnostic)
+
+    def add_file(self, _filename, lines):
+        self.lines += lines
+
+    def write(self, _text):
+        pass
+
+
+def report_diagnostic(writer, diagnostic):
+    add_diagnostic = getattr(writer, "add_diagnostic", None)
+    if add_diagnostic is not None:
+        add_diagnostic(diagnostic)
+    else:
+        writer.write(diagnostic.format())
+
+
+def report_file(writer, filename, lines):
+    # Sent after a file's diagnostics, with the number of source lines
+    # checked, to writers that keep per-file totals.
+    add_file = getattr(writer, "add_file", None)
+    if add_file is not None:
+        add_file(filename, lines)
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class FileBudget(object):
+    """Per-file limits on the bytes read and the wall time spent.
+
+    It also keeps count of the source lines checked.
+    """
+
+    # Transitions between time checks in the state machine.
+    CHECK_EVERY = 256
+
+    def __init__(self, max_size=None, max_time=None):
+        self.max_size = max_size
+        self.max_time = max_time
+        self.deadline = None
+        if max_time:
+            self.deadline = time.time() + max_time
+        self.size = 0
+        self.lines = 0
+
+    def add_bytes(self, count):
+        self.size += count
+        if self.max_size is not None and self.size > self.max_size:
+            raise BudgetExceeded("file is larger than %d bytes" %
+                                 self.max_size)
+
+    def check_time(self):
+        if self.deadline is not None and time.time() > self.deadline:
+            raise BudgetExceeded("checking took longer than %g seconds" %
+                                 self.max_time)
+
+
+class BudgetedFile(object):
+    """File-like wrapper charging everything read to a FileBudget."""
+
+    def __init__(self, filelike, budget):
+        self.filelike = filelike
+        self.budget = budget
+
+    def readline(self):
+        line = self.filelike.readline()
+        self.budget.add_bytes(len(line))
+        self.budget.check_time()
+        return line
+
+    def read(self, size=-1):
+        data = self.filelike.read(size)
+        self.budget.add_bytes(len(data))
+        self.budget.check_time()
+        return data
+
+
+class RuntimeReportWriter(object):
+    """Writer that adds loglint_runtime measurements to diagnostics."""
+
+    def __init__(self, writer, sites):
+        self.writer = writer
+        self.sites = sites
+
+    def add_diagnostic(self, diagnostic):
+        text = diagnostic.format()
+        key = (os.path.abspath(diagnostic.filename), diagnostic.line)
+        site = self.sites.get(key)
+        if site is not None:
+            text = text[:-1] + ("    runtime: ~%d calls (~%d at disabled"
+                                " levels), %.1f us per format\n\n" %
+                                (site["estimated_calls"],
+                                 site["estimated_disabled_calls"],
+                                 site["mean_format_us"]))
+        self.writer.write(text)
+
+    def write(self, text):
+        self.writer.write(text)
+
+
+def load_runtime_report(path):
+    """Load a report written by loglint_runtime, keyed by call site."""
+    import json
+    with open(path) as f:
+        report = json.load(f)
+    sites = {}
+    for site in report["sites"]:
+        sites[(os.path.abspath(site["filename"]), site["line"])] = site
+    return sites
+
+
 class BaseState(object):
 
+    # Everything the state machine finds belongs to this rule.
+    RULE = "logger-format"
+
     def __init__(self, filename, writer, options):
         self.filename = filename
         self.writer = writer
@@ -70,22 +340,19 @@ class BaseState(object):
     def current_token(self):
         return self.consumed_tokens[-1]
 
-    def format_message(self, msg):
-        self.writer.write(msg)
-        self.writer.write("\n")
-
+    def format_message(self, severity, msg):
         row, _ = self.current_token[2]
         line = self.current_token[4].rstrip()
-
-        self.writer.write("At line %d of '%s':\n" % (row, self.filename))
-        self.writer.write("    %s\n\n" % line)
+        report_diagnostic(self.writer,
+                          Diagnostic(self.filename, row, severity, msg, line,
+                                     self.RULE))
 
     def format_error(self, msg):
-        return self.format_message("ERROR: " + msg)
+        return self.format_message(Diagnostic.ERROR, msg)
 
     def format_warning(self, msg):
         if not self.options.no_warnings:
-            return self.format_message("WARNING: " + msg)
+            return self.format_message(Diagnostic.WARNING, msg)
 
     @staticmethod
     def _matches_token_req(value, required_value):
@@ -127,6 +394,12 @@ class TokenAnalysisMixin(object):
     def is_close_paren(self):
         return self.is_token(")", tokenize.OP)
 
+    def is_open_bracket(self):
+        return self.is_token(["(", "[", "{"], tokenize.OP)
+
+    def is_close_bracket(self):
+        return self.is_token([")", "]", "}"], tokenize.OP)
+
     def is_comma(self):
         return self.is_token(",", tokenize.OP)
 
@@ -162,19 +435,83 @@ class TokenAnalysisMixin(object):
         return self.is_token("format", tokenize.NAME)
 
     def is_possible_logger_statement(self):
-        return self.is_token(self.POSSIBLE_LOGGER_STRINGS, 1)
+        return self.is_token(self.logger_names, tokenize.NAME)
 
 
 class CountingArgsState(BaseState, TokenAnalysisMixin):
 
     NAME = "counting_args"
 
-    def __init__(self, filename, writer, options, expected_args, found_args):
+    def __init__(self, filename, writer, options, expected_args, found_args,
+                 mapping_keys=None):
         super(CountingArgsState, self).__init__(filename, writer, options)
         self.expected_args = expected_args
         self.found_args = found_args
+        self.mapping_keys = mapping_keys or []
         self.open_parens = 0
 
+    @staticmethod
+    def argument_kind(argument):
+        # Logger methods only take exc_info, extra, stack_info and
+        # stacklevel as keyword arguments, so neither those nor a
+        # **kwargs splat can feed the format string.  A *args splat
+        # means we can't know how many arguments there are.
+        token_type, token_string = argument[0][0:2]
+        if token_type == tokenize.OP and token_string == "**":
+            return "keyword"
+        if token_type == tokenize.OP and token_string == "*":
+            return "splat"
+        if (token_type == tokenize.NAME and
+                len(argument) > 1 and
+                argument[1][0:2] == (tokenize.OP, "=")):
+            return "keyword"
+        return "positional"
+
+    @staticmethod
+    def dict_literal_keys(argument):
+        # Return the string keys of a {"key": value} argument, or None if
+        # the argument isn't a dict literal with only string keys.
+        import ast
+        if (argument[0][1] != "{" or argument[-1][1] != "}" or
+                len(argument) < 3):
+            return None
+        keys = []
+        depth = 0
+        expect_key = True
+        for index, token in enumerate(argument[1:-1], 1):
+            if token[0] == tokenize.OP and token[1] in "([{":
+                depth += 1
+            elif token[0] == tokenize.OP and token[1] in ")]}":
+                depth -= 1
+            elif depth == 0 and token[1] == ",":
+                expect_key = True
+            elif depth == 0 and expect_key:
+                if (token[0] != tokenize.STRING or
+                        argument[index + 1][1] != ":"):
+                    return None
+                keys.append(ast.literal_eval(token[1]))
+                expect_key = False
+        return keys
+
+    def check_mapping_argument(self, positional):
+        if len(positional) != 1:
+            self.format_error("Logger statement uses %%(name)s format"
+                              " specifiers but %d argument(s) instead of"
+                              " one mapping." % len(positional))
+            return
+        if len(self.mapping_keys) != self.expected_args:
+            self.format_error("Logger statement mixes %(name)s and"
+                              " positional format specifiers.")
+            return
+        keys = self.dict_literal_keys(positional[0])
+        if keys is None:
+            return
+        missing = [key for key in self.mapping_keys if key not in keys]
+        if missing:
+            self.format_error("Logger statement format specifier key(s)"
+                              " %s missing from the mapping argument." %
+                              ", ".join(sorted(set(missing))))
+
     def format_expected_actual_args_difference(self):
         self.format_error("Logger statement has %d format"
                           " specifiers but %d argument(s)." %
@@ -224,48 +561,46 @@ class CountingArgsState(BaseState, TokenAnalysisMixin):
             return Transition("initial", tokens)
 
         # Ok, so if we've made it here then we found something other
-        # than a close paren which means it's an arg.. so we increment
-        # the found count and now the problem is that it could be a
-        # simple arg like "5" or it could be a complex nested arg like
-        # "foo.bar(baz, bif(bam, lambda: 5))" so now we need to
-        # basically just swallow everything checking for balanced
-        # parens until we hit either a comma or a close paren.  If
-        # it's a comma we increment the found count again and keep
-        # going.  If it's a close paren then we need to check if
-        # found_args matches expected_args and react accordingly.
-        self.found_args += 1
-
+        # than a close paren, normally the comma after the format
+        # string.  Now we collect the arguments up to the matching close
+        # paren.  They could be simple like "5" or complex and nested
+        # like "foo.bar(baz, {1: 2}, bif(bam, lambda: 5))", so we split
+        # on commas that aren't inside brackets.  A trailing comma
+        # like foo(5,) leaves an empty argument which we drop.
+        arguments = [[]]
         while True:
             self.consume_next_token(tokens)
 
-            # Let's handle the simpliest case first:
-            if self.is_comma() and self.open_parens <= 0:
-                # We need to make sure that this isn't a 1-tuple argument
-                # like so: foo(5,)
-                # So we peek at the next token...
-                self.consume_next_token(tokens)
-                one_tuple = self.is_close_paren()
-                self.rewind(tokens)
-
-                if not one_tuple:
-                    self.found_args += 1
-
-            # Now the slightly more complicated case:
-            elif self.is_close_paren():
-                # The close paren case is simple if aren't in a nested
-                # scope...we just exit the loop because we're done
-                if self.open_parens <= 0:
+            # Comments between arguments aren't part of them.
+            if self.current_token[0] == tokenize.COMMENT:
+                continue
+            if self.open_parens <= 0:
+                if self.is_comma():
+                    arguments.append([])
+                    continue
+                if self.is_close_paren():
                     break
-                # If we're in a nested scope then we decrement the
-                # nesting level and continue
-                self.open_parens -= 1
-            elif self.is_open_paren():
+            if self.is_open_bracket():
                 self.open_parens += 1
+            elif self.is_close_bracket():
+                self.open_parens -= 1
+            arguments[-1].append(self.current_token)
 
         # If we're broken out of the loop then we reached the last matching
         # paren so now we just need to confirm whether we found the appropriate
         # number of args.
-        if self.expected_args != self.found_args:
+        arguments = [argument for argument in arguments if argument]
+        kinds = [self.argument_kind(argument) for argument in arguments]
+        positional = [argument
+                      for argument, kind in zip(arguments, kinds)
+                      if kind == "positional"]
+        self.found_args += len(positional)
+
+        if "splat" in kinds:
+            self.format_warning("Can't count arguments passed with *args")
+        elif self.mapping_keys:
+            self.check_mapping_argument(positional)
+        elif self.expected_args != self.found_args:
             self.format_expected_actual_args_difference()
         return Transition("initial", tokens)
 
@@ -275,22 +610,7 @@ class LoggerFormatStringState(BaseState, TokenAnalysisMixin):
     NAME = "logger_format_string"
 
     def count_format_specifiers(self):
-        string = self.current_token[1]
-        count = 0
-        skip = False
-        for index in xrange(len(string)):
-            if skip:
-                skip = False
-            else:
-                try:
-                    if string[index] == "%":
-                        if string[index + 1] == "%":
-                            skip = True
-                        else:
-                            count += 1
-                except IndexError:
-                    pass
-        return count
+        return count_format_specifiers(self.current_token[1])
 
     def process(self, tokens):
         # At this point the format string is going to be the first
@@ -305,6 +625,7 @@ class LoggerFormatStringState(BaseState, TokenAnalysisMixin):
         # paren.
         self.consume_next_token(tokens)
         count = self.count_format_specifiers()
+        mapping_keys = format_mapping_keys(self.current_token[1])
 
         # Now we have the first format specifier string, but there
         # could be others concatenated or separated with explicit
@@ -318,6 +639,7 @@ class LoggerFormatStringState(BaseState, TokenAnalysisMixin):
             self.consume_next_token(tokens)
             if self.is_format_string():
                 count += self.count_format_specifiers()
+                mapping_keys += format_mapping_keys(self.current_token[1])
             elif self.is_asterisk():
                 # Ok we have something like:
                 # logger.debug("foo %s" * 5)
@@ -353,7 +675,8 @@ class LoggerFormatStringState(BaseState, TokenAnalysisMixin):
                 break
 
         if count > 0:
-            return Transition("counting_args", tokens, count, 0)
+            return Transition("counting_args", tokens, count, 0,
+                              mapping_keys=mapping_keys)
         else:
             # No format specifiers, so read the next token and confirm
             # that it's a close paren.
@@ -425,7 +748,7 @@ class PossibleLoggerStatementState(BaseState, TokenAnalysisMixin):
             self.rewind(tokens)
             return Transition("logger_format_string", tokens)
         except StopIteration:
-            return self.back_to_initial()
+            return self.back_to_initial(tokens)
 
 
 class InitialState(BaseState, TokenAnalysisMixin):
@@ -434,6 +757,12 @@ class InitialState(BaseState, TokenAnalysisMixin):
 
     POSSIBLE_LOGGER_STRINGS = set(["logger", "LOG", "log", "LOGGER"])
 
+    def __init__(self, filename, writer, options, logger_names=None):
+        super(InitialState, self).__init__(filename, writer, options)
+        if logger_names is None:
+            logger_names = self.POSSIBLE_LOGGER_STRINGS
+        self.logger_names = logger_names
+
     def process(self, tokens):
         # In this state, if we encounter a possible logger statement
         # token we want to transition to the logger state, otherwise
@@ -450,7 +779,8 @@ class InitialState(BaseState, TokenAnalysisMixin):
 
 class BrokenLoggingDetectorStateMachine(object):
 
-    def __init__(self):
+    def __init__(self, logger_names=None):
+        self.logger_names = logger_names
         self.states = {}
         for state in [InitialState,
                       PossibleLoggerStatementState,
@@ -461,15 +791,22 @@ class BrokenLoggingDetectorStateMachine(object):
 
     def make_new_state(self, filename, writer, options, transition):
         new_state_class = self.states[transition.new_state_name]
+        kwargs = transition.kwargs
+        if new_state_class is InitialState:
+            kwargs = dict(kwargs, logger_names=self.logger_names)
         new_state = new_state_class(*([filename,
                                        writer,
                                        options] + list(transition.args)),
-                                     **transition.kwargs)
+                                     **kwargs)
         return new_state
 
-    def consume(self, tokens, filename, writer, options):
-        state = InitialState(filename, writer, options)
+    def consume(self, tokens, filename, writer, options, budget=None):
+        state = InitialState(filename, writer, options, self.logger_names)
+        transitions = 0
         while True:
+            transitions += 1
+            if budget is not None and transitions % budget.CHECK_EVERY == 0:
+                budget.check_time()
             try:
                 transition = state.process(tokens)
                 state = self.make_new_state(filename,
@@ -480,18 +817,700 @@ class BrokenLoggingDetectorStateMachine(object):
                 break
 
 
-def examine_filelike(filename, filelike, options, writer=sys.stdout):
-    tokens = list(tokenize.generate_tokens(filelike.readline))
-    machine = BrokenLoggingDetectorStateMachine()
-    machine.consume(tokens, filename, writer, options)
+class FileContext(object):
+    """What a rule gets to know about the file it is checking."""
+
+    def __init__(self, filename, writer, options, logger_names=None,
+                 budget=None):
+        self.filename = filename
+        self.writer = writer
+        self.options = options
+        self.logger_names = logger_names
+        self.budget = budget
+
+
+class Call(object):
+    """A call found in a file's tokens, like logger.debug("x %s", x).
+
+    name is the dotted name called, arguments the tokens of each
+    argument, without the separating commas.
+    """
+
+    def __init__(self, name, name_token, close_token, arguments):
+        self.name = name
+        self.name_token = name_token
+        self.close_token = close_token
+        self.arguments = arguments
+
+
+def _call_name(tokens, open_index):
+    # Return (dotted name, index of its first token) for the call whose
+    # open paren is at open_index, or (None, None) if it isn't a call
+    # of a (dotted) name.
+    names = []
+    index = open_index - 1
+    while index >= 0 and tokens[index][0] in IGNORED_TOKENS:
+        index -= 1
+    while index >= 0 and tokens[index][0] == tokenize.NAME:
+        names.insert(0, tokens[index][1])
+        if index < 1 or tokens[index - 1][0:2] != (tokenize.OP, "."):
+            break
+        index -= 2
+    if not names or keyword.iskeyword(names[0]):
+        return None, None
+    if index > 0 and tokens[index - 1][1] in ("def", "class"):
+        return None, None
+    return ".".join(names), index
+
+
+def find_calls(tokens):
+    """Return the Calls in tokens, in the order they start."""
+    skipped = set(IGNORED_TOKENS) | set([tokenize.COMMENT])
+    calls = []
+    stack = []
+    for index, token in enumerate(tokens):
+        if token[0] != tokenize.OP:
+            continue
+        if token[1] in ("(", "[", "{"):
+            name = None
+            name_index = None
+            if token[1] == "(":
+                name, name_index = _call_name(tokens, index)
+            stack.append((name, name_index, [index]))
+        elif token[1] in (")", "]", "}") and stack:
+            name, name_index, boundaries = stack.pop()
+            if name is None:
+                continue
+            boundaries.append(index)
+            arguments = []
+            for start, end in zip(boundaries, boundaries[1:]):
+                argument = [t for t in tokens[start + 1:end]
+                            if t[0] not in skipped]
+                if argument:
+                    arguments.append(argument)
+            calls.append((name_index,
+                          Call(name, tokens[name_index], token, arguments)))
+        elif token[1] == "," and stack:
+            stack[-1][2].append(index)
+    calls.sort(key=lambda call: call[0])
+    return [call for _, call in calls]
+
+
+class Rule(object):
+    """Base class for checks.
+
+    A new instance is made for each file.  Rules subscribe to events by
+    listing them in EVENTS:
+
+        "tokens" - process_tokens(tokens) gets the file's token list
+        "token"  - process_token(token) gets each token in turn
+        "call"   - process_call(call) gets each Call in the file
+        "source" - process_source(source) gets the file's text
+
+    All rules share the file's single tokenization, which is skipped if
+    no rule needs tokens.
+    """
+
+    NAME = None
+
+    EVENTS = ()
+
+    def __init__(self, context):
+        self.context = context
+
+    def report(self, severity, msg, token=None):
+        # Without a token the problem is with the file as a whole.
+        if severity == Diagnostic.WARNING and self.context.options.no_warnings:
+            return
+        if token is None:
+            line, source = None, ""
+        else:
+            line, source = token[2][0], token[4].rstrip()
+        report_diagnostic(self.context.writer,
+                          Diagnostic(self.context.filename,
+                                     line,
+                                     severity,
+                                     msg,
+                                     source,
+                                     self.NAME))
+
+    def process_tokens(self, tokens):
+        pass
+
+    def process_token(self, token):
+        pass
+
+    def process_call(self, call):
+        pass
+
+    def process_source(self, source):
+        pass
+
+
+class LoggerFormatRule(Rule):
+    """The logger statement checks, run by the state machine."""
+
+    NAME = "logger-format"
+
+    EVENTS = ("tokens",)
+
+    def process_tokens(self, tokens):
+        context = self.context
+        machine = BrokenLoggingDetectorStateMachine(context.logger_names)
+        # The state machine consumes the list it is given.
+        try:
+            machine.consume(list(tokens),
+                            context.filename,
+                            context.writer,
+                            context.options,
+                            context.budget)
+        except IndexError:
+            # The states pop tokens without checking for the end.
+            self.report(Diagnostic.ERROR, "Reached the end of the file"
+                        " inside a logger statement.")
+
+
+class FastLoggerFormatRule(LoggerFormatRule):
+    """The logger-format rule without tokenizing the whole file.
+
+    One regular expression finds the comments, strings and possible
+    logger calls in the source.  A call on a single line with a plain
+    string literal format and simple arguments is checked right there.
+    Anything else (concatenated, multiplied or %-formatted strings,
+    %(name)s keys, *args, calls spanning lines, ...) is handed to the
+    state machine, tokenizing only the logical line the call starts.
+
+    Source that can't be tokenized is reported like LoggerFormatRule
+    does, but the file is only tokenized when parsing it fails.
+    """
+
+    EVENTS = ("source",)
+
+    _STRING = (r"[uUbBrR]{0,2}(?:"
+               r"'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''|"
+               r'"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""|'
+               r"'[^'\\\n]*(?:\\.[^'\\\n]*)*'|"
+               r'"[^"\\\n]*(?:\\.[^"\\\n]*)*")')
+
+    SCAN_RE = re.compile(r"(?P<comment>#[^\n]*)|(?P<string>%s)|"
+                         r"(?P<call>\b(?P<name>[A-Za-z_]\w*)\s*\.\s*"
+                         r"(?:%s)\s*\()" %
+                         (_STRING,
+                          "|".join(PossibleLoggerStatementState
+                                   .LOGGER_METHODS)),
+                         re.DOTALL)
+
+    # A string literal that ends on the line it starts on.
+    LITERAL_RE = re.compile(r"[uUbBrR]{0,2}(?:"
+                            r"'[^'\\\n]*(?:\\.[^'\\\n]*)*'|"
+                            r'"[^"\\\n]*(?:\\.[^"\\\n]*)*")')
+
+    STRING_START_RE = re.compile(r"[uUbBrR]{0,2}['\"]")
+
+    # Runs of argument text with no strings, brackets or commas.
+    PLAIN_RE = re.compile(r"[^'\"#\\()\[\]{},\n]*")
+
+    SPACES_RE = re.compile(r"[ \t\f]*")
+
+    KEYWORD_RE = re.compile(r"[A-Za-z_]\w*\s*=(?!=)")
+
+    LINE_RE = re.compile(r"[^\n]*\n|[^\n]+")
+
+    def process_source(self, source):
+        self.check_tokenizes(source)
+        logger_names = self.context.logger_names
+        if logger_names is None:
+            logger_names = InitialState.POSSIBLE_LOGGER_STRINGS
+        budget = self.context.budget
+        self.source = source
+        self.counted_to = 0
+        self.newlines = 0
+        candidates = 0
+        pos = 0
+        while True:
+            match = self.SCAN_RE.search(source, pos)
+            if match is None:
+                break
+            pos = match.end()
+            if (match.group("call") is None or
+                    match.group("name") not in logger_names):
+                continue
+            candidates += 1
+            if budget is not None and candidates % budget.CHECK_EVERY == 0:
+                budget.check_time()
+            end = self.check_call(match)
+            if end is None:
+                end = self.check_tokens(match.start("call"))
+            pos = end
+
+    def line_number(self, pos):
+        # Positions only ever move forward, so newlines are counted
+        # incrementally.
+        self.newlines += self.source.count("\n", self.counted_to, pos)
+        self.counted_to = pos
+        return self.newlines + 1
+
+    def skip_spaces(self, pos):
+        return self.SPACES_RE.match(self.source, pos).end()
+
+    def check_tokenizes(self, source):
+        # Raise the error tokenizing the file would, before anything is
+        # reported.  Source that parses tokenizes too, and the parser
+        # module is far quicker than the tokenize module.
+        import parser
+        try:
+            parser.suite(source)
+            return
+        except Exception:
+            pass
+        for _ in tokenize.generate_tokens(StringIO(source).readline):
+            pass
+
+    def check_call(self, match):
+        # Check the call and return where to carry on scanning, or
+        # return None if the state machine has to look at it.
+        source = self.source
+        if "\n" in match.group("call"):
+            return None
+        pos = self.skip_spaces(match.end())
+        literal = self.LITERAL_RE.match(source, pos)
+        if literal is None:
+            if (source[pos:pos + 1] in ("", "\r", "\n", "#", "\\") or
+                    self.STRING_START_RE.match(source, pos)):
+                return None
+            # The first argument isn't a string, so this isn't a
+            # logger statement we check.
+            return match.end()
+        format_string = literal.group(0)
+        if "%(" in format_string:
+            return None
+
+        pos = self.skip_spaces(literal.end())
+        if source.startswith(")", pos):
+            arguments = []
+            close = pos
+        elif source.startswith(",", pos):
+            split = self.split_arguments(pos + 1)
+            if split is None:
+                return None
+            arguments, close = split
+        else:
+            return None
+
+        found = 0
+        for argument in arguments:
+            if argument.startswith("**") or self.KEYWORD_RE.match(argument):
+                continue
+            if argument.startswith("*"):
+                return None
+            found += 1
+        expected = count_format_specifiers(format_string)
+        if expected != found:
+            self.report_at(close,
+                           "Logger statement has %d format specifiers but"
+                           " %d argument(s)." % (expected, found))
+        return close + 1
+
+    def split_arguments(self, pos):
+        # Split the arguments after the format string on top level
+        # commas, returning them with the position of the close paren,
+        # or None if they don't end on this line or need tokenizing.
+        source = self.source
+        arguments = []
+        start = pos
+        depth = 0
+        while True:
+            pos = self.PLAIN_RE.match(source, pos).end()
+            char = source[pos:pos + 1]
+            if char in ("'", '"'):
+                literal = self.LITERAL_RE.match(source, pos)
+                if literal is None or source.startswith(char * 3, pos):
+                    return None
+                pos = literal.end()
+                continue
+            if char in ("(", "[", "{"):
+                depth += 1
+            elif char in (")", "]", "}"):
+                if depth == 0:
+                    if char != ")":
+                        return None
+                    arguments.append(source[start:pos].strip())
+                    return [argument for argument in arguments
+                            if argument], pos
+                depth -= 1
+            elif char == "," and depth == 0:
+                arguments.append(source[start:pos].strip())
+                start = pos + 1
+            else:
+                # End of line or file, a comment or a continuation.
+                return None
+            pos += 1
+
+    def report_at(self, pos, msg):
+        # Report as the state machine does, at the close paren.
+        source = self.source
+        line_start = source.rfind("\n", 0, pos) + 1
+        line_end = source.find("\n", pos)
+        if line_end == -1:
+            line_end = len(source)
+        row = self.line_number(pos)
+        col = pos - line_start
+        self.report(Diagnostic.ERROR,
+                    msg,
+                    (tokenize.OP, ")", (row, col), (row, col + 1),
+                     source[line_start:line_end + 1]))
+
+    def check_tokens(self, start):
+        # Run the state machine over the logical line that starts with
+        # the call at start, returning the position where it ends.
+        source = self.source
+        first_row = self.line_number(start)
+        prefix = source[source.rfind("\n", 0, start) + 1:start]
+        lines = self.LINE_RE.finditer(source, start)
+        end = [start]
+
+        def readline():
+            for line in lines:
+                end[0] = line.end()
+                return line.group()
+            return ""
+
+        tokens = []
+        for token in tokenize.generate_tokens(readline):
+            token_type, string, (srow, scol), (erow, ecol), line = token
+            # Put back what was before the call on its first line.
+            if srow == 1:
+                scol += len(prefix)
+                line = prefix + line
+            if erow == 1:
+                ecol += len(prefix)
+            tokens.append((token_type,
+                           string,
+                           (srow + first_row - 1, scol),
+                           (erow + first_row - 1, ecol),
+                           line))
+            if token_type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                break
+        if tokens[-1][0] != tokenize.ENDMARKER:
+            # Stop the state machine here as if the file ended.
+            row, col = tokens[-1][3]
+            tokens.append((tokenize.ENDMARKER, "", (row, col), (row, col),
+                           ""))
+        super(FastLoggerFormatRule, self).process_tokens(tokens)
+        return end[0]
+
+
+# Built in rules, in the order they run.
+RULES = [LoggerFormatRule]
+
+ENTRY_POINT_GROUP = "loglint.rules"
+
+_entry_point_rules = None
+
+
+def load_rule(spec):
+    """Import a rule class given as "package.module:ClassName"."""
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError("Rule %r should look like module:ClassName" % spec)
+    module = __import__(module_name, fromlist=[class_name])
+    return getattr(module, class_name)
 
 
-def examine(filename, options, writer=sys.stdout):
+def entry_point_rules():
+    # pkg_resources is slow to import so it's only used with --plugins,
+    # and only once per process.
+    global _entry_point_rules
+    if _entry_point_rules is None:
+        try:
+            import pkg_resources
+        except ImportError:
+            _entry_point_rules = []
+        else:
+            _entry_point_rules = [
+                entry_point.load() for entry_point in
+                pkg_resources.iter_entry_points(ENTRY_POINT_GROUP)]
+    return _entry_point_rules
+
+
+class RuleRunner(object):
+    """Runs the enabled rules over each file and times them."""
+
+    TOKEN_EVENTS = set(["tokens", "token", "call"])
+
+    def __init__(self, rule_classes):
+        self.rule_classes = rule_classes
+        self.stats = {}
+
+    @classmethod
+    def from_options(cls, options):
+        rule_classes = list(RULES)
+        if options.engine == "fast":
+            rule_classes = [FastLoggerFormatRule
+                            if rule_class is LoggerFormatRule
+                            else rule_class
+                            for rule_class in rule_classes]
+        if options.plugins:
+            rule_classes.extend(entry_point_rules())
+        for spec in options.rules or []:
+            rule_classes.append(load_rule(spec))
+        disabled = set(options.disabled_rules or [])
+        enabled = []
+        seen = set()
+        for rule_class in rule_classes:
+            if rule_class.NAME in disabled or rule_class.NAME in seen:
+                continue
+            seen.add(rule_class.NAME)
+            enabled.append(rule_class)
+        return cls(enabled)
+
+    @property
+    def names(self):
+        return [rule_class.NAME for rule_class in self.rule_classes]
+
+    def record_time(self, name, elapsed):
+        files, total = self.stats.get(name, (0, 0.0))
+        self.stats[name] = (files + 1, total + elapsed)
+
+    def run(self, filelike, context):
+        """Run the rules over filelike, returning its number of lines."""
+        source = None
+        readline = filelike.readline
+        if any("source" in rule_class.EVENTS
+               for rule_class in self.rule_classes):
+            source = "".join(iter(filelike.readline, ""))
+            readline = StringIO(source).readline
+        tokens = None
+        calls = None
+        for rule_class in self.rule_classes:
+            if tokens is None and set(rule_class.EVENTS) & self.TOKEN_EVENTS:
+                tokens = list(tokenize.generate_tokens(readline))
+            start = time.time()
+            try:
+                rule = rule_class(context)
+                if "source" in rule.EVENTS:
+                    rule.process_source(source)
+                if "tokens" in rule.EVENTS:
+                    rule.process_tokens(tokens)
+                if "token" in rule.EVENTS:
+                    for token in tokens:
+                        rule.process_token(token)
+                if "call" in rule.EVENTS:
+                    if calls is None:
+                        calls_start = time.time()
+                        calls = find_calls(tokens)
+                        calls_elapsed = time.time() - calls_start
+                        # Charged separately, not to the first call rule.
+                        self.record_time("(finding calls)", calls_elapsed)
+                        start += calls_elapsed
+                    for call in calls:
+                        rule.process_call(call)
+            except (BudgetExceeded, tokenize.TokenError, SyntaxError):
+                # Problems with the file, not the rule.
+                raise
+            except Exception, ex:
+                # One broken rule shouldn't stop the others.
+                report_diagnostic(context.writer,
+                                  Diagnostic(context.filename,
+                                             None,
+                                             Diagnostic.ERROR,
+                                             "Rule %s failed: %r" %
+                                             (rule_class.NAME, ex),
+                                             "",
+                                             rule_class.NAME))
+            finally:
+                self.record_time(rule_class.NAME, time.time() - start)
+        if source is not None:
+            return source.count("\n") + (source[-1:] not in ("", "\n"))
+        if tokens is not None:
+            # The row of the ENDMARKER is one past the last line.
+            return tokens[-1][2][0] - 1
+        return 0
+
+    def format_stats(self):
+        lines = ["%-30s %8s %10s" % ("rule", "files", "seconds")]
+        for name, (files, total) in sorted(self.stats.items(),
+                                           key=lambda item: -item[1][1]):
+            lines.append("%-30s %8d %10.4f" % (name, files, total))
+        return "\n".join(lines) + "\n"
+
+
+def examine_filelike(filename, filelike, options, writer=sys.stdout,
+                     logger_names=None, budget=None, runner=None):
+    if runner is None:
+        runner = RuleRunner.from_options(options)
+    lines = runner.run(filelike, FileContext(filename, writer, options,
+                                             logger_names, budget))
+    if budget is not None:
+        budget.lines += lines
+
+
+class LineReader(object):
+    """Minimal file-like object reading from an iterator of lines."""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def readline(self):
+        return next(self.lines, "")
+
+
+def _iter_cell_lines(source):
+    # Cell sources are either one string or a list of lines.  IPython
+    # magics and shell escapes are blanked so the line numbers still
+    # match the cell.
+    if isinstance(source, basestring):
+        source = [source]
+    for chunk in source:
+        if isinstance(chunk, unicode):
+            chunk = chunk.encode("utf-8")
+        for line in chunk.splitlines(True):
+            if line.lstrip().startswith(("%", "!")):
+                yield "\n"
+            else:
+                yield line
+
+
+def _is_cell_magic(source):
+    if isinstance(source, basestring):
+        return source.startswith("%%")
+    return bool(source) and source[0].startswith("%%")
+
+
+def iter_notebook_cells(filelike):
+    """Yield (cell number, source) for the code cells of a notebook.
+
+    When ijson is installed the notebook is parsed as a stream and cell
+    outputs are skipped without being built, otherwise the whole
+    document is loaded with json.
+    """
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+    if ijson is None:
+        import json
+        cells = json.load(filelike).get("cells", [])
+        for number, cell in enumerate(cells, 1):
+            if cell.get("cell_type") == "code":
+                yield number, cell.get("source", [])
+        return
+
+    number = 0
+    cell_type = None
+    source = []
+    for prefix, event, value in ijson.parse(filelike):
+        if prefix == "cells.item":
+            if event == "start_map":
+                number += 1
+                cell_type = None
+                source = []
+            elif event == "end_map" and cell_type == "code":
+                yield number, source
+        elif prefix == "cells.item.cell_type":
+            cell_type = value
+        elif (prefix in ("cells.item.source", "cells.item.source.item") and
+              event == "string"):
+            source.append(value)
+
+
+def examine_notebook(filename, filelike, options, writer=sys.stdout,
+                     logger_names=None, budget=None, runner=None):
+    # Each code cell is checked on its own and reported as
+    # "<notebook>:cell <n>" with line numbers relative to the cell.
+    for number, source in iter_notebook_cells(filelike):
+        if _is_cell_magic(source):
+            continue
+        cell = "%s:cell %d" % (filename, number)
+        try:
+            examine_filelike(cell,
+                             LineReader(_iter_cell_lines(source)),
+                             options,
+                             writer=writer,
+                             logger_names=logger_names,
+                             budget=budget,
+                             runner=runner)
+        except (tokenize.TokenError, SyntaxError), ex:
+            # One cell that doesn't parse doesn't stop the others.
+            report_diagnostic(writer,
+                              Diagnostic(cell,
+                                         None,
+                                         Diagnostic.ERROR,
+                                         "Couldn't parse cell: %s" %
+                                         (ex.args[0],),
+                                         ""))
+
+
+def examine_source(filename, filelike, options, writer=sys.stdout,
+                   logger_names=None, runner=None):
+    """Examine python source or a notebook, depending on filename.
+
+    Problems with the file itself, including going over the size or
+    time budget, are reported as diagnostics instead of raised so one
+    bad file can't stop a whole run.  Returns False if the file was
+    only partly checked because it went over its budget.
+    """
+    if filename.endswith(NOTEBOOK_EXTENSIONS):
+        handler = examine_notebook
+    else:
+        handler = examine_filelike
+    budget = FileBudget(options.max_file_size, options.max_file_time)
+    if runner is None:
+        runner = RuleRunner.from_options(options)
+
+    def report(severity, msg):
+        if severity != Diagnostic.WARNING or not options.no_warnings:
+            report_diagnostic(writer,
+                              Diagnostic(filename, None, severity, msg, ""))
+
+    complete = True
+    try:
+        handler(filename, BudgetedFile(filelike, budget), options,
+                writer=writer, logger_names=logger_names, budget=budget,
+                runner=runner)
+    except BudgetExceeded, ex:
+        report(Diagnostic.WARNING, "Skipped the rest of the file: %s." % ex)
+        complete = False
+    except (tokenize.TokenError, SyntaxError, ValueError), ex:
+        report(Diagnostic.ERROR, "Couldn't parse file: %s" % (ex.args[0],))
+    except Exception, ex:
+        report(Diagnostic.ERROR, "Internal error while checking file: %r" %
+               (ex,))
+    report_file(writer, filename, budget.lines)
+    return complete
+
+
+def within_size_budget(filename, options, writer=sys.stdout):
+    # Checked before opening files so huge generated files aren't read.
+    if options.max_file_size is None:
+        return True
+    try:
+        size = os.path.getsize(filename)
+    except OSError:
+        return True
+    if size <= options.max_file_size:
+        return True
+    if not options.no_warnings:
+        report_diagnostic(writer,
+                          Diagnostic(filename, None, Diagnostic.WARNING,
+                                     "Skipped: file is larger than %d"
+                                     " bytes." % options.max_file_size,
+                                     ""))
+    report_file(writer, filename, 0)
+    return False
+
+
+def examine(filename, options, writer=sys.stdout, logger_names=None,
+            runner=None):
     if options.verbose:
         writer.write("Checking file: %s\n" % filename)
+    if not within_size_budget(filename, options, writer):
+        return
     try:
         with open(filename) as f:
-            examine_filelike(filename, f, options, writer=writer)
+            examine_source(filename, f, options, writer=writer,
+                           logger_names=logger_names, runner=runner)
     except IOError, ex:
         args = ex.args
         if isinstance(args, tuple):
@@ -499,15 +1518,998 @@ def examine(filename, options, writer=sys.stdout):
                 raise
 
 
-def recursively_examine(filename, options, writer=sys.stdout):
-    for root, dirs, files in os.walk(filename):
-        for fn in files:
-            if fn.endswith(".py"):
-                full_path = os.path.join(root, fn)
-                examine(full_path, options, writer=writer)
+def list_dir(dirpath):
+    """Return sorted (subdirectories, files) of dirpath.
+
+    Symlinked directories are reported as files so that, like
+    os.walk, we never follow them.
+    """
+    dirs = []
+    files = []
+    if scandir is not None:
+        for entry in scandir(dirpath):
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    else:
+        for name in os.listdir(dirpath):
+            st = os.lstat(os.path.join(dirpath, name))
+            if stat.S_ISDIR(st.st_mode):
+                dirs.append(name)
+            else:
+                files.append(name)
+    return sorted(dirs), sorted(files)
+
+
+def read_gitignore(dirpath):
+    # Only the simple subset of the .gitignore syntax is supported:
+    # globs, trailing "/" for directories and "/" anchoring.
+    # Negated ("!") patterns are ignored.
+    rules = []
+    try:
+        with open(os.path.join(dirpath, ".gitignore")) as f:
+            lines = f.readlines()
+    except IOError:
+        return rules
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("!"):
+            continue
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        rules.append((dirpath, line.lstrip("/"), dir_only, anchored))
+    return rules
+
+
+def is_excluded(path, is_dir, excludes, rules):
+    name = os.path.basename(path)
+    for pattern in excludes:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern):
+            return True
+    for base, pattern, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if anchored:
+            target = os.path.relpath(path, base)
+        else:
+            target = name
+        if fnmatch.fnmatch(target, pattern):
+            return True
+    return False
+
+
+def _split_tokens(tokens, separator):
+    # Split (type, string) pairs on a top level (unbracketed) operator.
+    parts = [[]]
+    depth = 0
+    for token in tokens:
+        if token[0] == tokenize.OP:
+            if token[1] in "([{":
+                depth += 1
+            elif token[1] in ")]}":
+                depth -= 1
+            elif token[1] == separator and depth == 0:
+                parts.append([])
+                continue
+        parts[-1].append(token)
+    return parts
+
+
+def _top_level_index(tokens, strings):
+    # Index of the first unbracketed token in strings, or len(tokens).
+    depth = 0
+    for index, token in enumerate(tokens):
+        if depth == 0 and token[1] in strings:
+            return index
+        if token[0] == tokenize.OP:
+            if token[1] in ("(", "[", "{"):
+                depth += 1
+            elif token[1] in (")", "]", "}"):
+                depth -= 1
+    return len(tokens)
+
+
+def _dotted_name(tokens):
+    # Return the last name of a dotted name like "self.log", or None
+    # if tokens are anything else.
+    if not tokens or len(tokens) % 2 == 0:
+        return None
+    for index, (token_type, string) in enumerate(tokens):
+        if index % 2 == 0 and token_type != tokenize.NAME:
+            return None
+        if index % 2 == 1 and string != ".":
+            return None
+    return tokens[-1][1]
+
+
+def _target_names(tokens):
+    # The names bound by a target like "a, (b, self.c)".
+    tokens = [token for token in tokens
+              if token[1] not in ("(", ")", "[", "]")]
+    names = []
+    for part in _split_tokens(tokens, ","):
+        name = _dotted_name(part)
+        if name is not None:
+            names.append(name)
+    return names
+
+
+def _add_block_symbols(tokens, symbols):
+    # Names bound by the header of a for, with or except block.
+    first = tokens[0][1]
+    header = tokens[1:]
+    header = header[:_top_level_index(header, (":",))]
+    if first == "for":
+        symbols["others"].extend(
+            _target_names(header[:_top_level_index(header, ("in",))]))
+    elif first == "with":
+        for item in _split_tokens(header, ","):
+            as_index = _top_level_index(item, ("as",))
+            symbols["others"].extend(_target_names(item[as_index + 1:]))
+    elif _top_level_index(header, ("as",)) < len(header):
+        as_index = _top_level_index(header, ("as",))
+        symbols["others"].extend(_target_names(header[as_index + 1:]))
+    else:
+        # Python 2's "except Error, name:".
+        parts = _split_tokens(header, ",")
+        if len(parts) == 2:
+            symbols["others"].extend(_target_names(parts[1]))
+
+
+def _add_import_symbols(tokens, symbols):
+    if tokens[0][1] == "import":
+        for part in _split_tokens(tokens[1:], ","):
+            strings = [string for _type, string in part]
+            if "as" in strings:
+                symbols["others"].append(strings[-1])
+            elif strings:
+                symbols["others"].append(strings[0])
+        return
+
+    strings = [string for _type, string in tokens[1:]]
+    if "import" not in strings:
+        return
+    split_at = strings.index("import")
+    module = "".join(strings[:split_at])
+    names = [token for token in tokens[split_at + 2:]
+             if token[1] not in "()"]
+    for part in _split_tokens(names, ","):
+        strings = [string for _type, string in part]
+        if not strings or strings[0] == "*":
+            continue
+        alias = strings[-1]
+        symbols["imports"][alias] = [module, strings[0]]
+
+
+def _add_statement_symbols(tokens, symbols, local=False):
+    # Names bound inside a def or class (local is true), including
+    # parameters, don't change what the module's own names refer to.
+    # Only loggers and aliases are taken from there, for attributes
+    # like self.log.
+    first = tokens[0][1]
+    if first in ("import", "from"):
+        if not local:
+            _add_import_symbols(tokens, symbols)
+        return
+    if first in ("def", "class"):
+        if len(tokens) > 1 and not local:
+            symbols["others"].append(tokens[1][1])
+        return
+    if first in ("for", "with", "except"):
+        if not local:
+            _add_block_symbols(tokens, symbols)
+        return
+
+    parts = _split_tokens(tokens, "=")
+    if len(parts) < 2:
+        return
+    value = parts[-1]
+    value_strings = [string for _type, string in value]
+    for target in parts[:-1]:
+        name = _dotted_name(target)
+        if name is None:
+            continue
+        if "getLogger" in value_strings:
+            symbols["loggers"].append(name)
+        elif _dotted_name(value) is not None:
+            symbols["aliases"][name] = _dotted_name(value)
+        elif not local:
+            symbols["others"].append(name)
+
+
+def extract_symbols(readline):
+    """Find the logger related bindings in a module.
+
+    Returns a JSON friendly dict with the names bound to
+    getLogger(...) calls ("loggers"), the module level names bound to
+    anything else, including loop variables and "as" targets
+    ("others"), the names imported with "from x import y"
+    ("imports") and plain name to name assignments ("aliases").
+    """
+    symbols = {"loggers": [], "others": [], "imports": {}, "aliases": {}}
+    skipped = set([tokenize.COMMENT, tokenize.NL])
+    # For each indented block, whether it's inside a def or class.
+    local = [False]
+    opens_scope = False
+    line = []
+    for token in tokenize.generate_tokens(readline):
+        if token[0] == tokenize.INDENT:
+            local.append(local[-1] or opens_scope)
+        elif token[0] == tokenize.DEDENT:
+            local.pop()
+        elif token[0] in (tokenize.NEWLINE, tokenize.ENDMARKER):
+            opens_scope = bool(line) and line[0][1] in ("def", "class")
+            for statement in _split_tokens(line, ";"):
+                if statement:
+                    _add_statement_symbols(statement, symbols, local[-1])
+            line = []
+        elif token[0] not in skipped:
+            line.append(token[0:2])
+    return symbols
+
+
+def import_root(dirpath):
+    """Return the directory that dirpath's modules are imported from."""
+    dirpath = os.path.abspath(dirpath)
+    while os.path.exists(os.path.join(dirpath, "__init__.py")):
+        parent = os.path.dirname(dirpath)
+        if parent == dirpath:
+            break
+        dirpath = parent
+    return dirpath
+
+
+def module_name(root, filename):
+    relpath = os.path.relpath(os.path.abspath(filename), root)
+    parts = os.path.splitext(relpath)[0].split(os.sep)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+def absolute_module(module, is_package, imported):
+    # Resolve relative imports like "from ..log import logger".
+    level = len(imported) - len(imported.lstrip("."))
+    if level == 0:
+        return imported
+    parts = module.split(".")
+    if not is_package:
+        parts.pop()
+    if level > 1:
+        parts = parts[:-(level - 1)]
+    return ".".join(parts + [imported[level:]]).strip(".")
+
+
+class SymbolIndex(object):
+    """Per-module logger bindings across a project.
+
+    Each file's entry is only rebuilt when its mtime or size changes,
+    so the index can be kept in a FileIndex and reused between runs.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+        self.modules = {}
+        # Project roots whose modules were all indexed in this run.
+        self.roots = set()
+
+    def update(self, filename, module):
+        filename = os.path.abspath(filename)
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return
+        is_package = os.path.basename(filename) == "__init__.py"
+        entry = self.entries.get(filename)
+        if (entry is None or
+                entry["mtime"] != st.st_mtime or
+                entry["size"] != st.st_size):
+            try:
+                with open(filename) as f:
+                    symbols = extract_symbols(f.readline)
+            except (IOError, tokenize.TokenError, SyntaxError):
+                symbols = extract_symbols(StringIO("").readline)
+            entry = {"mtime": st.st_mtime,
+                     "size": st.st_size,
+                     "symbols": symbols}
+            self.entries[filename] = entry
+        entry["module"] = module
+        entry["is_package"] = is_package
+        self.modules[module] = filename
+
+    def is_logger(self, module, name, seen=None):
+        """True/False if module.name is/isn't a logger, None if unknown."""
+        seen = seen or set()
+        if (module, name) in seen or module not in self.modules:
+            return None
+        seen.add((module, name))
+        entry = self.entries[self.modules[module]]
+        symbols = entry["symbols"]
+        if name in symbols["loggers"]:
+            return True
+        if name in symbols["imports"]:
+            imported, imported_name = symbols["imports"][name]
+            imported = absolute_module(module, entry["is_package"], imported)
+            return self.is_logger(imported, imported_name, seen)
+        if name in symbols["aliases"]:
+            return self.is_logger(module, symbols["aliases"][name], seen)
+        if name in symbols["others"]:
+            return False
+        return None
+
+    def logger_names(self, filename):
+        entry = self.entries.get(os.path.abspath(filename))
+        names = set(InitialState.POSSIBLE_LOGGER_STRINGS)
+        if entry is None:
+            return names
+        symbols = entry["symbols"]
+        names.difference_update(symbols["others"])
+        names.update(symbols["loggers"])
+        for alias, (imported, name) in symbols["imports"].items():
+            imported = absolute_module(entry["module"],
+                                       entry["is_package"],
+                                       imported)
+            resolved = self.is_logger(imported, name)
+            if resolved:
+                names.add(alias)
+            elif resolved is False:
+                names.discard(alias)
+        for alias, name in symbols["aliases"].items():
+            if name in names:
+                names.add(alias)
+        return names
+
+
+def resolve_logger_names(top, filenames, index, excludes=(),
+                         use_gitignore=True):
+    """Yield (filename, logger names) for the filenames under top.
+
+    Every module of the project top is in, not only the filenames, is
+    indexed in index.symbols first so loggers imported from elsewhere
+    in the project are found.
+    """
+    root = import_root(top if os.path.isdir(top) else
+                       os.path.dirname(os.path.abspath(top)))
+    symbols = index.symbols
+    if root not in symbols.roots:
+        for filename in index.walk(root, excludes, use_gitignore):
+            if filename.endswith(".py"):
+                symbols.update(filename, module_name(root, filename))
+        symbols.roots.add(root)
+    filenames = list(filenames)
+    for filename in filenames:
+        # In case it was excluded from the walk.
+        if filename.endswith(".py"):
+            symbols.update(filename, module_name(root, filename))
+    for filename in filenames:
+        yield filename, symbols.logger_names(filename)
+
+
+class FileIndex(object):
+    """Snapshot of a source tree used to speed up repeated scans.
+
+    Directory listings are cached against the directory mtime so only
+    directories that changed are listed again.  Files are cached with
+    their mtime, size, content hash, number of source lines and the
+    diagnostics they produced, and the SymbolIndex used for
+    --resolve-loggers is kept alongside.
+    """
+
+    VERSION = 6
+
+    def __init__(self, path=None, options_key=None):
+        self.path = path
+        self.options_key = options_key
+        self.dirs = {}
+        self.files = {}
+        self.symbols = SymbolIndex()
+        # The trees walked in this run and the absolute paths found in
+        # them, so save() can drop what was deleted or renamed.
+        self.walked = set()
+        self.visited = set()
+
+    @classmethod
+    def load(cls, path, options_key=None):
+        import json
+        index = cls(path, options_key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return index
+        if (data.get("version") == cls.VERSION and
+                data.get("options") == options_key):
+            index.dirs = data.get("dirs", {})
+            index.files = data.get("files", {})
+            index.symbols = SymbolIndex(data.get("symbols", {}))
+        return index
+
+    def save(self):
+        import json
+        if self.path is None:
+            return
+        self.prune()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.VERSION,
+                       "options": self.options_key,
+                       "dirs": self.dirs,
+                       "files": self.files,
+                       "symbols": self.symbols.entries}, f)
+        os.rename(tmp_path, self.path)
+
+    def prune(self):
+        """Drop the entries in walked trees that this run didn't find.
+
+        Entries outside them are kept, so checking one directory of a
+        project doesn't throw away what is cached for the rest.
+        """
+        visited = self.visited.union(self.symbols.modules.values())
+        for entries in (self.dirs, self.files, self.symbols.entries):
+            for path in list(entries):
+                abspath = os.path.abspath(path)
+                if abspath not in visited and self.was_walked(abspath):
+                    del entries[path]
+
+    def was_walked(self, abspath):
+        for top in self.walked:
+            if abspath == top or abspath.startswith(top + os.sep):
+                return True
+        return False
+
+    def list_dir(self, dirpath):
+        mtime = os.stat(dirpath).st_mtime
+        entry = self.dirs.get(dirpath)
+        if entry is not None and entry["mtime"] == mtime:
+            return entry["dirs"], entry["files"]
+        dirs, files = list_dir(dirpath)
+        files = [fn for fn in files
+                 if fn.endswith(SOURCE_EXTENSIONS) or fn == ".gitignore"]
+        self.dirs[dirpath] = {"mtime": mtime, "dirs": dirs, "files": files}
+        return dirs, files
+
+    def walk(self, top, excludes=(), use_gitignore=True):
+        # Excluded directories are pruned before we descend into them.
+        self.walked.add(os.path.abspath(top).rstrip(os.sep))
+        stack = [(top, [])]
+        while stack:
+            dirpath, rules = stack.pop()
+            try:
+                dirs, files = self.list_dir(dirpath)
+            except OSError:
+                continue
+            self.visited.add(os.path.abspath(dirpath))
+            if use_gitignore and ".gitignore" in files:
+                rules = rules + read_gitignore(dirpath)
+            for fn in files:
+                if not fn.endswith(SOURCE_EXTENSIONS):
+                    continue
+                full_path = os.path.join(dirpath, fn)
+                if not is_excluded(full_path, False, excludes, rules):
+                    self.visited.add(os.path.abspath(full_path))
+                    yield full_path
+            for dn in reversed(dirs):
+                full_path = os.path.join(dirpath, dn)
+                if not is_excluded(full_path, True, excludes, rules):
+                    stack.append((full_path, rules))
+
+    @staticmethod
+    def _loggers_key(logger_names):
+        # Results depend on which names were treated as loggers.
+        if logger_names is None:
+            return None
+        return sorted(logger_names)
+
+    def cached_result(self, filename, st, logger_names=None):
+        entry = self.files.get(filename)
+        if (entry is not None and
+                entry["mtime"] == st.st_mtime and
+                entry["size"] == st.st_size and
+                entry["loggers"] == self._loggers_key(logger_names)):
+            return entry["result"]
+        return None
+
+    def cached_result_for_digest(self, filename, digest, logger_names=None):
+        entry = self.files.get(filename)
+        if (entry is not None and
+                entry["hash"] == digest and
+                entry["loggers"] == self._loggers_key(logger_names)):
+            return entry["result"]
+        return None
+
+    def record(self, filename, st, digest, result, logger_names=None,
+               lines=None):
+        # Without lines the count recorded before is kept.
+        if lines is None:
+            lines = self.files.get(filename, {}).get("lines", 0)
+        self.files[filename] = {"mtime": st.st_mtime,
+                                "size": st.st_size,
+                                "hash": digest,
+                                "loggers": self._loggers_key(logger_names),
+                                "result": result,
+                                "lines": lines}
+
+    def lines(self, filename):
+        return self.files[filename]["lines"]
+
+
+def index_options_key(options, runner):
+    # Cached results are only valid for the options that produced them.
+    return ("no_warnings=%s,ignore_pct_formats=%s,rules=%s,"
+            "max_file_size=%s,max_file_time=%s" % (
+                bool(options.no_warnings),
+                bool(options.ignore_pct_formats),
+                ",".join(runner.names),
+                options.max_file_size,
+                options.max_file_time))
+
+
+def examine_indexed(filename, options, index, writer=sys.stdout,
+                    logger_names=None, runner=None):
+    import hashlib
+    if options.verbose:
+        writer.write("Checking file: %s\n" % filename)
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return
+    if not within_size_budget(filename, options, writer):
+        return
+    result = index.cached_result(filename, st, logger_names)
+    if result is None:
+        with open(filename) as f:
+            source = f.read()
+        digest = hashlib.sha1(source).hexdigest()
+        result = index.cached_result_for_digest(filename, digest,
+                                                logger_names)
+        lines = None
+        if result is None:
+            collector = DiagnosticCollector()
+            complete = examine_source(filename, StringIO(source), options,
+                                      writer=collector,
+                                      logger_names=logger_names,
+                                      runner=runner)
+            if not complete:
+                # Checked again next time instead of caching a partial
+                # result.
+                for diagnostic in collector.diagnostics:
+                    report_diagnostic(writer, diagnostic)
+                report_file(writer, filename, collector.lines)
+                return
+            result = [diagnostic.as_dict()
+                      for diagnostic in collector.diagnostics]
+            lines = collector.lines
+        index.record(filename, st, digest, result, logger_names, lines)
+    for data in result:
+        report_diagnostic(writer, Diagnostic.from_dict(data))
+    report_file(writer, filename, index.lines(filename))
+
+
+def recursively_examine(filename, options, writer=sys.stdout, index=None,
+                        runner=None):
+    excludes = DEFAULT_EXCLUDES + (options.exclude or [])
+    use_gitignore = not options.no_gitignore
+    if index is None:
+        index = FileIndex()
+    filenames = index.walk(filename, excludes, use_gitignore)
+    if options.resolve_loggers:
+        targets = resolve_logger_names(filename, filenames, index,
+                                       excludes, use_gitignore)
+    else:
+        targets = ((full_path, None) for full_path in filenames)
+    for full_path, logger_names in targets:
+        if index.path is None:
+            examine(full_path, options, writer=writer,
+                    logger_names=logger_names, runner=runner)
+        else:
+            examine_indexed(full_path, options, index, writer=writer,
+                            logger_names=logger_names, runner=runner)
+
+
+class CodeOwners(object):
+    """Owners of paths, read from a CODEOWNERS style file.
+
+    Each line is a pattern followed by the owners of the paths it
+    matches, the last matching line wins.  Patterns are the subset of
+    the .gitignore syntax read_gitignore() supports, and a pattern that
+    matches a directory matches everything in it.
+    """
+
+    # Where CODEOWNERS is looked for when no file is given.
+    LOCATIONS = ["CODEOWNERS",
+                 os.path.join(".github", "CODEOWNERS"),
+                 os.path.join("docs", "CODEOWNERS")]
+
+    def __init__(self, root, rules=None):
+        self.root = root
+        self.rules = rules or []
+
+    @classmethod
+    def load(cls, path):
+        # Patterns are relative to the repository, which for a file in
+        # .github/ or docs/ is the directory above.
+        root = os.path.dirname(os.path.abspath(path))
+        if os.path.basename(root) in (".github", "docs"):
+            root = os.path.dirname(root)
+        rules = []
+        with open(path) as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                if not fields:
+                    continue
+                pattern = fields[0]
+                dir_only = pattern.endswith("/")
+                pattern = pattern.rstrip("/")
+                anchored = "/" in pattern
+                rules.append((pattern.lstrip("/"), dir_only, anchored,
+                              fields[1:]))
+        return cls(root, rules)
+
+    @classmethod
+    def find(cls, path="."):
+        """Load the nearest CODEOWNERS file above path, or return None.
+
+        path and each directory above it are searched in turn, so the
+        repository's file is found whatever the working directory is.
+        """
+        dirpath = os.path.abspath(path)
+        if not os.path.isdir(dirpath):
+            dirpath = os.path.dirname(dirpath)
+        while True:
+            for location in cls.LOCATIONS:
+                filename = os.path.join(dirpath, location)
+                if os.path.isfile(filename):
+                    return cls.load(filename)
+            parent = os.path.dirname(dirpath)
+            if parent == dirpath:
+                return None
+            dirpath = parent
+
+    def owners(self, filename):
+        relpath = os.path.relpath(os.path.abspath(filename), self.root)
+        if relpath.startswith(os.pardir):
+            return []
+        parts = relpath.split(os.sep)
+        owners = []
+        for pattern, dir_only, anchored, rule_owners in self.rules:
+            # Try the path and each of the directories it's in.
+            for depth in xrange(1, len(parts) + 1):
+                if dir_only and depth == len(parts):
+                    continue
+                if anchored:
+                    target = "/".join(parts[:depth])
+                else:
+                    target = parts[depth - 1]
+                if fnmatch.fnmatch(target, pattern):
+                    owners = rule_owners
+                    break
+        return owners
+
+
+def top_level_package(filename):
+    """Return the top-level package filename is in, or None."""
+    dirpath = os.path.dirname(os.path.abspath(filename))
+    root = import_root(dirpath)
+    if root == dirpath:
+        return None
+    return os.path.relpath(dirpath, root).split(os.sep)[0]
+
+
+def per_kloc(findings, lines):
+    if not lines:
+        return 0.0
+    return findings * 1000.0 / lines
+
+
+class Summary(object):
+    """Writer that adds up diagnostics instead of printing them.
+
+    Findings are counted by severity and by rule, and together with the
+    files and lines checked, by top-level package and by owner so
+    findings per thousand lines can be compared.  Summaries of separate
+    sets of files are combined with merge().
+    """
+
+    NO_PACKAGE = "(none)"
+    NO_OWNER = "(unowned)"
+    # The rule of problems with a file itself, like not parsing.
+    FILE_RULE = "(file)"
+
+    def __init__(self, owners=None):
+        self.owners = owners
+        self.files = 0
+        self.lines = 0
+        self.findings = 0
+        self.by_severity = {}
+        self.by_rule = {}
+        # name: [files, lines, findings]
+        self.by_package = {}
+        self.by_owner = {}
+        self.pending = []
+
+    @staticmethod
+    def _add_count(counts, name, count):
+        counts[name] = counts.get(name, 0) + count
+
+    @staticmethod
+    def _add_totals(totals, name, values):
+        current = totals.setdefault(name, [0, 0, 0])
+        for index, value in enumerate(values):
+            current[index] += value
+
+    def add_diagnostic(self, diagnostic):
+        # Held until add_file(), which comes after a file's diagnostics.
+        self.pending.append(diagnostic)
+
+    def add_file(self, filename, lines):
+        findings = len(self.pending)
+        for diagnostic in self.pending:
+            self._add_count(self.by_severity, diagnostic.severity, 1)
+            self._add_count(self.by_rule,
+                            diagnostic.rule or self.FILE_RULE,
+                            1)
+        self.pending = []
+        self.files += 1
+        self.lines += lines
+        self.findings += findings
+
+        totals = [1, lines, findings]
+        self._add_totals(self.by_package,
+                         top_level_package(filename) or self.NO_PACKAGE,
+                         totals)
+        owners = []
+        if self.owners is not None:
+            owners = self.owners.owners(filename)
+        for owner in owners or [self.NO_OWNER]:
+            self._add_totals(self.by_owner, owner, totals)
+
+    def write(self, _text):
+        pass
+
+    def merge(self, other):
+        """Add the counts of other to this summary and return it."""
+        self.files += other.files
+        self.lines += other.lines
+        self.findings += other.findings
+        self.pending.extend(other.pending)
+        for counts, other_counts in [(self.by_severity, other.by_severity),
+                                     (self.by_rule, other.by_rule)]:
+            for name, count in other_counts.items():
+                self._add_count(counts, name, count)
+        for totals, other_totals in [(self.by_package, other.by_package),
+                                     (self.by_owner, other.by_owner)]:
+            for name, values in other_totals.items():
+                self._add_totals(totals, name, values)
+        return self
+
+    def as_dict(self):
+        def groups(totals):
+            return dict((name, {"files": files,
+                                "lines": lines,
+                                "findings": findings,
+                                "findings_per_kloc": per_kloc(findings,
+                                                              lines)})
+                        for name, (files, lines, findings)
+                        in totals.items())
+
+        return {"files": self.files,
+                "lines": self.lines,
+                "findings": self.findings,
+                "findings_per_kloc": per_kloc(self.findings, self.lines),
+                "by_severity": dict(self.by_severity),
+                "by_rule": dict(self.by_rule),
+                "by_package": groups(self.by_package),
+                "by_owner": groups(self.by_owner)}
+
+    def format(self):
+        out = ["%d finding(s) in %d file(s) of %d lines, %.2f per KLOC" %
+               (self.findings,
+                self.files,
+                self.lines,
+                per_kloc(self.findings, self.lines)),
+               ""]
+        for title, counts in [("severity", self.by_severity),
+                              ("rule", self.by_rule)]:
+            out.append("%-30s %8s" % (title, "findings"))
+            for name, count in sorted(counts.items(),
+                                      key=lambda item: (-item[1], item[0])):
+                out.append("%-30s %8d" % (name, count))
+            out.append("")
+        for title, totals in [("package", self.by_package),
+                              ("owner", self.by_owner)]:
+            out.append("%-30s %8s %8s %8s %8s" %
+                       (title, "files", "lines", "findings", "per KLOC"))
+            for name, (files, lines, findings) in sorted(
+                    totals.items(), key=lambda item: (-item[1][2], item[0])):
+                out.append("%-30s %8d %8d %8d %8.2f" %
+                           (name, files, lines, findings,
+                            per_kloc(findings, lines)))
+            out.append("")
+        return "\n".join(out)
+
+
+class Config(object):
+    """Options for the library API, mirroring the command line flags."""
+
+    def __init__(self,
+                 ignore_pct_formats=False,
+                 no_warnings=False,
+                 exclude=None,
+                 no_gitignore=False,
+                 verbose=False,
+                 debug=False,
+                 index=None,
+                 resolve_loggers=False,
+                 max_file_size=None,
+                 max_file_time=None,
+                 rules=None,
+                 disabled_rules=None,
+                 plugins=False,
+                 stats=False,
+                 engine="token"):
+        self.ignore_pct_formats = ignore_pct_formats
+        self.no_warnings = no_warnings
+        self.exclude = list(exclude or [])
+        self.no_gitignore = no_gitignore
+        self.verbose = verbose
+        self.debug = debug
+        self.index = index
+        self.resolve_loggers = resolve_loggers
+        self.max_file_size = max_file_size
+        self.max_file_time = max_file_time
+        self.rules = list(rules or [])
+        self.disabled_rules = list(disabled_rules or [])
+        self.plugins = plugins
+        self.stats = stats
+        self.engine = engine
+
+    @classmethod
+    def from_options(cls, options):
+        return cls(ignore_pct_formats=bool(options.ignore_pct_formats),
+                   no_warnings=bool(options.no_warnings),
+                   exclude=options.exclude,
+                   no_gitignore=bool(options.no_gitignore),
+                   verbose=bool(options.verbose),
+                   debug=bool(options.debug),
+                   index=options.index,
+                   resolve_loggers=bool(options.resolve_loggers),
+                   max_file_size=options.max_file_size,
+                   max_file_time=options.max_file_time,
+                   rules=options.rules,
+                   disabled_rules=options.disabled_rules,
+                   plugins=bool(options.plugins),
+                   stats=bool(options.stats),
+                   engine=options.engine)
+
+
+def lint_filelike(filename, filelike, config=None, logger_names=None,
+                  runner=None):
+    collector = DiagnosticCollector()
+    examine_source(filename, filelike, config or Config(),
+                   writer=collector, logger_names=logger_names,
+                   runner=runner)
+    return collector.diagnostics
+
+
+def lint_source(text, config=None, filename="<string>"):
+    """Return the list of Diagnostics for the python source in text."""
+    return lint_filelike(filename, StringIO(text), config)
+
+
+def lint_file(filename, config=None, logger_names=None, runner=None):
+    config = config or Config()
+    collector = DiagnosticCollector()
+    if not within_size_budget(filename, config, collector):
+        return collector.diagnostics
+    try:
+        with open(filename) as f:
+            return lint_filelike(filename, f, config, logger_names, runner)
+    except IOError, ex:
+        if ex.errno != 2:  # No such file or directory
+            raise
+    return []
+
+
+def _lint_file_star(args):
+    return lint_file(*args)
+
+
+def iter_source_files(paths, config=None):
+    """Yield (filename, logger names) for every file to lint."""
+    config = config or Config()
+    excludes = DEFAULT_EXCLUDES + config.exclude
+    use_gitignore = not config.no_gitignore
+    index = FileIndex()
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = index.walk(path, excludes, use_gitignore)
+        else:
+            filenames = [path]
+        if config.resolve_loggers:
+            for target in resolve_logger_names(path, filenames, index,
+                                               excludes, use_gitignore):
+                yield target
+        else:
+            for filename in filenames:
+                yield filename, None
+
+
+def lint_paths(paths, config=None, jobs=1):
+    """Yield the Diagnostics for every file under paths.
+
+    Directories are walked like they are on the command line.  With
+    jobs > 1 files are linted in a pool of worker processes; results
+    are still yielded in file order.
+    """
+    config = config or Config()
+    targets = iter_source_files(paths, config)
+    if jobs <= 1:
+        runner = RuleRunner.from_options(config)
+        for filename, logger_names in targets:
+            for diagnostic in lint_file(filename, config, logger_names,
+                                        runner):
+                yield diagnostic
+        return
+
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        work = ((filename, config, logger_names)
+                for filename, logger_names in targets)
+        for diagnostics in pool.imap(_lint_file_star, work):
+            for diagnostic in diagnostics:
+                yield diagnostic
+    finally:
+        pool.terminate()
+
+
+def _summarize_files(args):
+    targets, config, owners = args
+    summary = Summary(owners)
+    runner = RuleRunner.from_options(config)
+    for filename, logger_names in targets:
+        examine(filename, config, writer=summary, logger_names=logger_names,
+                runner=runner)
+    return summary
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def summarize_paths(paths, config=None, jobs=1, owners=None, batch_size=64):
+    """Return a Summary of the findings for every file under paths.
+
+    owners is a CodeOwners, if any.  With jobs > 1 batches of files are
+    summarized in a pool of worker processes and the partial summaries
+    are merged as they come in.
+    """
+    config = config or Config()
+    targets = iter_source_files(paths, config)
+    if jobs <= 1:
+        return _summarize_files((targets, config, owners))
+
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    try:
+        work = ((batch, config, owners)
+                for batch in _batches(targets, batch_size))
+        return reduce(Summary.merge,
+                      pool.imap_unordered(_summarize_files, work),
+                      Summary(owners))
+    finally:
+        pool.terminate()
 
 
 def parse_args():
+    import optparse
     parser = optparse.OptionParser()
     parser.add_option("-v", "--verbose",
                       help="enable verbose output",
@@ -521,23 +2523,293 @@ def parse_args():
     parser.add_option("--no-warnings",
                       help="don't show warnings about un-handle-able lines",
                       action="store_true")
+    parser.add_option("--exclude",
+                      help="skip files and directories matching this glob"
+                      " (may be repeated)",
+                      action="append",
+                      metavar="GLOB")
+    parser.add_option("--no-gitignore",
+                      help="don't skip paths listed in .gitignore files",
+                      action="store_true")
+    parser.add_option("--files-from",
+                      help="also check the paths listed in FILE, one per"
+                      " line or NUL separated (- reads stdin)",
+                      metavar="FILE")
+    parser.add_option("--stdin-filename",
+                      help="name to report for source read from stdin"
+                      " (given as -); a .ipynb name reads a notebook",
+                      metavar="NAME")
+    parser.add_option("--resolve-loggers",
+                      help="find loggers by following getLogger()"
+                      " assignments and imports across the project instead"
+                      " of only by name",
+                      action="store_true")
+    parser.add_option("--runtime-report",
+                      help="annotate findings with the measurements in"
+                      " a report written by loglint_runtime",
+                      metavar="FILE")
+    parser.add_option("--max-file-size",
+                      help="skip files larger than BYTES",
+                      type="int",
+                      metavar="BYTES")
+    parser.add_option("--max-file-time",
+                      help="stop checking a file after SECONDS, keeping"
+                      " what was found so far",
+                      type="float",
+                      metavar="SECONDS")
+    parser.add_option("--rule",
+                      help="also run the rule class MODULE:CLASS"
+                      " (may be repeated)",
+                      action="append",
+                      dest="rules",
+                      metavar="MODULE:CLASS")
+    parser.add_option("--disable-rule",
+                      help="don't run the rule called NAME"
+                      " (may be repeated)",
+                      action="append",
+                      dest="disabled_rules",
+                      metavar="NAME")
+    parser.add_option("--plugins",
+                      help="also run rules registered under the"
+                      " 'loglint.rules' entry point group",
+                      action="store_true")
+    parser.add_option("--engine",
+                      help="how to find logger statements: 'token' runs"
+                      " the state machine over every token, 'fast' scans"
+                      " with a regular expression and only tokenizes"
+                      " calls it can't check itself (default: token)",
+                      type="choice",
+                      choices=["token", "fast"],
+                      default="token")
+    parser.add_option("--summary",
+                      help="print the number of findings by severity,"
+                      " rule, top-level package and owner instead of each"
+                      " finding",
+                      action="store_true")
+    parser.add_option("--summary-json",
+                      help="write the --summary as JSON to FILE"
+                      " (- for stdout instead of the text summary)",
+                      metavar="FILE")
+    parser.add_option("--owners",
+                      help="CODEOWNERS style file giving the owners for"
+                      " --summary (default: the nearest CODEOWNERS,"
+                      " .github/CODEOWNERS or docs/CODEOWNERS above the"
+                      " first path)",
+                      metavar="FILE")
+    parser.add_option("--stats",
+                      help="print the time spent in each rule to stderr",
+                      action="store_true")
+    parser.add_option("--index",
+                      help="cache directory listings and results in FILE"
+                      " to speed up later runs",
+                      metavar="FILE")
+    parser.add_option("-j", "--jobs",
+                      help="check files in N worker processes (not with"
+                      " --index or --stats)",
+                      type="int",
+                      default=1,
+                      metavar="N")
     return parser.parse_args()
 
 
+def enable_debug_logging():
+    global logger
+    import logging
+    logging.basicConfig(level=logging.DEBUG)
+    logger = logging.getLogger(__name__)
+
+
+def iter_file_list(filelike, chunk_size=65536):
+    """Yield the paths in a newline or NUL separated list.
+
+    The list is read in chunks so it can be arbitrarily long.  It is
+    taken to be NUL separated if a NUL shows up no later than the first
+    newline's chunk.
+    """
+    separator = None
+    pending = ""
+    while True:
+        chunk = filelike.read(chunk_size)
+        if not chunk:
+            break
+        if separator is None:
+            if "\0" in chunk:
+                separator = "\0"
+            elif "\n" in chunk:
+                separator = "\n"
+            else:
+                pending += chunk
+                continue
+        paths = (pending + chunk).split(separator)
+        pending = paths.pop()
+        for path in paths:
+            path = path.rstrip("\r")
+            if path:
+                yield path
+    pending = pending.rstrip("\r\n")
+    if pending:
+        yield pending
+
+
+def iter_targets(args, file_list=None):
+    # Command line arguments then the paths in the file_list file, each
+    # path only once.
+    seen = set()
+    paths = iter(args)
+    if file_list is not None:
+        paths = itertools.chain(paths, iter_file_list(file_list))
+    for path in paths:
+        key = path if path == "-" else os.path.normpath(path)
+        if key not in seen:
+            seen.add(key)
+            yield path
+
+
+def examine_path(filename, options, writer=sys.stdout, index=None,
+                 runner=None):
+    if filename == "-":
+        examine_source(options.stdin_filename or "<stdin>",
+                       sys.stdin,
+                       options,
+                       writer=writer,
+                       runner=runner)
+    elif os.path.isdir(filename):
+        recursively_examine(filename, options, writer=writer,
+                            index=index, runner=runner)
+    elif not os.path.exists(filename):
+        # Unlike files that vanish during a walk, a path that was asked
+        # for by name, say in a build system's file list, is an error.
+        report_diagnostic(writer,
+                          Diagnostic(filename, None, Diagnostic.ERROR,
+                                     "No such file or directory.", ""))
+        report_file(writer, filename, 0)
+    elif options.resolve_loggers:
+        if index is None:
+            index = FileIndex()
+        for _, logger_names in resolve_logger_names(
+                filename, [filename], index,
+                DEFAULT_EXCLUDES + (options.exclude or []),
+                not options.no_gitignore):
+            examine(filename, options, writer=writer,
+                    logger_names=logger_names, runner=runner)
+    else:
+        examine(filename, options, writer=writer, runner=runner)
+
+
+def _pooled_targets(targets, rest):
+    # The targets worker processes can check, putting stdin and paths
+    # that don't exist in rest to be reported by examine_path().
+    for filename in targets:
+        if filename != "-" and os.path.exists(filename):
+            yield filename
+        else:
+            rest.append(filename)
+
+
+def write_summary(summary, json_path=None):
+    import json
+    if json_path != "-":
+        sys.stdout.write(summary.format())
+    if json_path is None:
+        return
+    text = json.dumps(summary.as_dict(), indent=1, sort_keys=True,
+                      separators=(",", ": ")) + "\n"
+    if json_path == "-":
+        sys.stdout.write(text)
+    else:
+        with open(json_path, "w") as f:
+            f.write(text)
+
+
 def main():
+    """Run the command line, returning the exit status.
+
+    That's 1 if any errors were found, 2 for bad usage and 0 otherwise.
+    """
     options, args = parse_args()
 
+    if options.files_from == "-" and "-" in args:
+        sys.stderr.write("Can't read both source and --files-from"
+                         " from stdin.\n")
+        return 2
+
+    if options.jobs > 1 and (options.index or options.stats):
+        sys.stderr.write("Can't use --jobs with --index or --stats.\n")
+        return 2
+
+    file_list = None
+    if options.files_from == "-":
+        file_list = sys.stdin
+    elif options.files_from is not None:
+        try:
+            file_list = open(options.files_from)
+        except IOError, ex:
+            sys.stderr.write("Can't read --files-from %s: %s\n" %
+                             (options.files_from, ex.strerror))
+            return 2
+
     if options.debug:
-        logging.basicConfig(level=logging.DEBUG)
-    else:
-        logging.basicConfig(level=logging.INFO)
+        enable_debug_logging()
 
-    for filename in args:
-        if os.path.isdir(filename):
-            recursively_examine(filename, options)
+    writer = sys.stdout
+    summary = None
+    if options.summary or options.summary_json:
+        if options.owners:
+            owners = CodeOwners.load(options.owners)
         else:
-            examine(filename, options)
+            # Found from the first target, or from here for stdin.
+            owners = CodeOwners.find(args[0] if args and args[0] != "-"
+                                     else ".")
+        summary = writer = Summary(owners)
+    elif options.runtime_report:
+        sites = load_runtime_report(options.runtime_report)
+        writer = RuntimeReportWriter(writer, sites)
+    writer = DiagnosticCounter(writer)
+
+    runner = RuleRunner.from_options(options)
+
+    # Kept for the whole run, even when not saved, so the project is
+    # only indexed once for --resolve-loggers.
+    index = FileIndex()
+    if options.index:
+        index = FileIndex.load(options.index,
+                               index_options_key(options, runner))
+
+    try:
+        targets = iter_targets(args, file_list)
+        if options.jobs > 1:
+            rest = []
+            pooled = _pooled_targets(targets, rest)
+            config = Config.from_options(options)
+            if summary is not None:
+                summary.merge(summarize_paths(pooled, config, options.jobs,
+                                              owners))
+            else:
+                for diagnostic in lint_paths(pooled, config, options.jobs):
+                    report_diagnostic(writer, diagnostic)
+            targets = rest
+        for filename in targets:
+            examine_path(filename, options, writer=writer, index=index,
+                         runner=runner)
+    finally:
+        if file_list is not None and file_list is not sys.stdin:
+            file_list.close()
+
+    index.save()
+
+    if summary is not None:
+        write_summary(summary, options.summary_json)
+
+    if options.stats:
+        sys.stderr.write(runner.format_stats())
+
+    # Summaries from worker processes only reach the Summary.
+    counts = writer.counts if summary is None else summary.by_severity
+    if counts.get(Diagnostic.ERROR):
+        return 1
+    return 0
 
 
+# loglint_cli.py starts faster than running this file directly.
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
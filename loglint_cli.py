@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+"""Fast starting command line entry point for loglint.
+
+Running loglint.py as a script compiles the whole module on every run.
+Importing it from here uses the cached loglint.pyc instead, which is
+what matters when linting one or two files at a time.
+"""
+
+import sys
+
+import loglint
+
+if __name__ == '__main__':
+    sys.exit(loglint.main())
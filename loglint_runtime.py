@@ -0,0 +1,223 @@
+"""Runtime companion to loglint.
+
+Installs a hook in a running process which samples logger calls per
+call site: how long formatting the message takes, how many calls
+happen at disabled levels and whether the number of arguments matches
+the format specifiers.  The ranked report it writes can be passed to
+loglint with --runtime-report to annotate its findings.
+
+Records are sampled by a logging.Filter on every logger, so they keep
+their real call site.  Calls at disabled levels never make a record
+and are counted from Logger.isEnabledFor, which returns before the
+logging module looks for the caller.
+
+    import loglint_runtime
+    hook = loglint_runtime.install(sample_every=100)
+    ...
+    hook.dump("loglint-runtime.json")
+
+Only one in every sample_every calls is measured; the others pay for a
+counter increment and a modulo.
+"""
+
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+
+from loglint import count_format_specifiers
+
+def is_mismatch(msg, args):
+    if not isinstance(msg, basestring):
+        return False
+    # A single dict argument is used for %(name)s style formats.
+    if len(args) == 1 and isinstance(args[0], dict) and args[0]:
+        return False
+    return count_format_specifiers(msg) != len(args)
+
+
+def in_logging(frame):
+    return os.path.normcase(frame.f_code.co_filename) == logging._srcfile
+
+
+def caller_frame(frame):
+    # Skip the logging module's frames (exception() calls error(),
+    # LoggerAdapter calls the logger, etc.)
+    while frame.f_back is not None and in_logging(frame):
+        frame = frame.f_back
+    return frame
+
+
+class CallSite(object):
+
+    def __init__(self, filename, line, level):
+        self.filename = filename
+        self.line = line
+        self.level = level
+        self.msg = None
+        self.sampled_calls = 0
+        self.disabled_calls = 0
+        self.formatted_calls = 0
+        self.format_time = 0.0
+        self.format_errors = 0
+        self.mismatches = 0
+
+    def as_dict(self, sample_every):
+        mean_format_time = 0.0
+        if self.formatted_calls:
+            mean_format_time = self.format_time / self.formatted_calls
+        estimated_calls = self.sampled_calls * sample_every
+        return {"filename": self.filename,
+                "line": self.line,
+                "level": logging.getLevelName(self.level),
+                "msg": self.msg,
+                "sampled_calls": self.sampled_calls,
+                "estimated_calls": estimated_calls,
+                "estimated_disabled_calls":
+                    self.disabled_calls * sample_every,
+                "mean_format_us": mean_format_time * 1e6,
+                "estimated_format_seconds": self.format_time * sample_every,
+                "format_errors": self.format_errors,
+                "mismatches": self.mismatches}
+
+
+class RuntimeHook(logging.Filter):
+
+    def __init__(self, sample_every=100, timer=time.time):
+        logging.Filter.__init__(self)
+        self.sample_every = max(1, int(sample_every))
+        self.timer = timer
+        self.sites = {}
+        self.lock = threading.Lock()
+        self.originals = {}
+        self._counter = itertools.count()
+
+    def should_sample(self):
+        # next() on itertools.count is atomic under the GIL.
+        return next(self._counter) % self.sample_every == 0
+
+    def install(self):
+        if self.originals:
+            return self
+        manager = logging.Logger.manager
+        self.originals["getLogger"] = logging.Manager.getLogger
+        self.originals["isEnabledFor"] = logging.Logger.isEnabledFor
+        logging.Manager.getLogger = self._wrap_get_logger(
+            logging.Manager.getLogger)
+        logging.Logger.isEnabledFor = self._wrap_is_enabled_for(
+            logging.Logger.isEnabledFor)
+        for logger in [manager.root] + list(manager.loggerDict.values()):
+            if isinstance(logger, logging.Logger):
+                logger.addFilter(self)
+        return self
+
+    def uninstall(self):
+        if not self.originals:
+            return
+        manager = logging.Logger.manager
+        logging.Manager.getLogger = self.originals["getLogger"]
+        logging.Logger.isEnabledFor = self.originals["isEnabledFor"]
+        for logger in [manager.root] + list(manager.loggerDict.values()):
+            if isinstance(logger, logging.Logger):
+                logger.removeFilter(self)
+        self.originals = {}
+
+    def _wrap_get_logger(self, original):
+        hook = self
+
+        # Gives loggers made after install() the filter too.
+        def getLogger(manager, name):
+            logger = original(manager, name)
+            logger.addFilter(hook)
+            return logger
+
+        getLogger.__doc__ = original.__doc__
+        return getLogger
+
+    def _wrap_is_enabled_for(self, original):
+        hook = self
+
+        def isEnabledFor(logger, level):
+            enabled = original(logger, level)
+            if not enabled and hook.should_sample():
+                hook.record_disabled(sys._getframe(1), level)
+            return enabled
+
+        isEnabledFor.__doc__ = original.__doc__
+        return isEnabledFor
+
+    def filter(self, record):
+        if self.should_sample():
+            args = record.args
+            # LogRecord unpacks a single mapping argument.
+            if isinstance(args, dict):
+                args = (args,)
+            self.record(record.pathname, record.lineno, record.levelno,
+                        record.msg, args, record)
+        return True
+
+    def record_disabled(self, frame, level):
+        # Only calls from the Logger methods count, not code checking
+        # isEnabledFor itself, and their msg and args are in the frame.
+        if not in_logging(frame):
+            return
+        local_vars = frame.f_locals
+        if "msg" not in local_vars:
+            return
+        caller = caller_frame(frame)
+        self.record(caller.f_code.co_filename, caller.f_lineno, level,
+                    local_vars["msg"], local_vars.get("args", ()))
+
+    def record(self, filename, line, level, msg, args, record=None):
+        # record is the LogRecord of an enabled call, None if the
+        # level was disabled.
+        key = (filename, line)
+        elapsed = None
+        format_error = False
+        if record is not None:
+            start = self.timer()
+            try:
+                record.getMessage()
+            except Exception:
+                format_error = True
+            elapsed = self.timer() - start
+        mismatch = is_mismatch(msg, args)
+
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None:
+                site = CallSite(filename, line, level)
+                site.msg = msg if isinstance(msg, basestring) else repr(msg)
+                self.sites[key] = site
+            site.sampled_calls += 1
+            if record is not None:
+                site.formatted_calls += 1
+                site.format_time += elapsed
+            else:
+                site.disabled_calls += 1
+            if format_error:
+                site.format_errors += 1
+            if mismatch:
+                site.mismatches += 1
+
+    def report(self):
+        """Call sites ranked by estimated time spent formatting."""
+        with self.lock:
+            sites = [site.as_dict(self.sample_every)
+                     for site in self.sites.values()]
+        sites.sort(key=lambda site: (site["estimated_format_seconds"],
+                                     site["estimated_disabled_calls"]),
+                   reverse=True)
+        return {"sample_every": self.sample_every, "sites": sites}
+
+    def dump(self, path):
+        import json
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+
+
+def install(sample_every=100):
+    """Install a RuntimeHook on every logger and return it."""
+    return RuntimeHook(sample_every).install()
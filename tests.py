@@ -1,3 +1,9 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
 import unittest
 import tokenize
 
@@ -11,6 +17,32 @@ from badlog import InitialState
 from badlog import PossibleLoggerStatementState
 from badlog import LoggerFormatStringState
 from badlog import CountingArgsState
+from badlog import FileIndex
+from badlog import index_options_key
+from badlog import recursively_examine
+from badlog import Config
+from badlog import Diagnostic
+from badlog import lint_source
+from badlog import lint_filelike
+from badlog import lint_paths
+from badlog import SymbolIndex
+from badlog import extract_symbols
+from badlog import iter_notebook_cells
+from badlog import load_runtime_report
+from badlog import RuntimeReportWriter
+from badlog import Rule
+from badlog import RuleRunner
+from badlog import LoggerFormatRule
+from badlog import FastLoggerFormatRule
+from badlog import find_calls
+from badlog import load_rule
+from badlog import iter_file_list
+from badlog import main
+from badlog import CodeOwners
+from badlog import Summary
+from badlog import summarize_paths
+
+from loglint_runtime import RuntimeHook
 
 TEST_FILENAME = "test.py"
 
@@ -39,6 +71,46 @@ class AbstractStateTest(unittest.TestCase):
         self.assertEquals(expected_state.NAME, transition.new_state_name)
 
 
+class TempTreeMixin(object):
+    """Gives each test an empty temporary directory, self.root."""
+
+    def setUp(self):
+        super(TempTreeMixin, self).setUp()
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        super(TempTreeMixin, self).tearDown()
+
+    def write_file(self, relpath, contents):
+        path = os.path.join(self.root, relpath)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(contents)
+        return path
+
+
+class CommandLineMixin(TempTreeMixin):
+    """Adds run_main(), running the command line with stdout captured."""
+
+    def setUp(self):
+        super(CommandLineMixin, self).setUp()
+        self.saved = sys.argv, sys.stdout, sys.stderr
+
+    def tearDown(self):
+        sys.argv, sys.stdout, sys.stderr = self.saved
+        super(CommandLineMixin, self).tearDown()
+
+    def run_main(self, *args):
+        # What main() wrote to stderr is left in self.stderr.
+        sys.argv = ["loglint"] + list(args)
+        sys.stdout = StringIO()
+        self.stderr = sys.stderr = StringIO()
+        status = main()
+        return status, sys.stdout.getvalue()
+
+
 class BaseStateTests(AbstractStateTest):
 
     def test_rewind(self):
@@ -361,5 +433,850 @@ class IntegrationTests(AbstractStateTest):
         self.assertEquals("", self.output)
 
 
+class FileIndexTests(TempTreeMixin, AbstractStateTest):
+
+    def setUp(self):
+        super(FileIndexTests, self).setUp()
+        self.index_path = os.path.join(self.root, "index.json")
+
+    def walk(self, index=None):
+        index = index or FileIndex()
+        return sorted(index.walk(self.root, [".git", "node_modules"]))
+
+    def test_walk_prunes_excluded_directories(self):
+        good = self.write_file("pkg/mod.py", "")
+        self.write_file(".git/hook.py", "")
+        self.write_file("node_modules/x/y.py", "")
+        self.write_file("pkg/README", "")
+        self.assertEquals([good], self.walk())
+
+    def test_walk_respects_gitignore(self):
+        good = self.write_file("pkg/mod.py", "")
+        self.write_file("build/gen.py", "")
+        self.write_file("pkg/skip_me.py", "")
+        self.write_file(".gitignore", "build/\nskip_*.py\n")
+        self.assertEquals([good], self.walk())
+
+    def test_unchanged_directory_listing_is_reused(self):
+        self.write_file("pkg/mod.py", "")
+        index = FileIndex()
+        self.walk(index)
+        pkg = os.path.join(self.root, "pkg")
+        index.dirs[pkg]["files"].append("cached.py")
+        self.assertIn(os.path.join(pkg, "cached.py"), self.walk(index))
+
+    def test_results_are_cached_across_runs(self):
+        src = "logger.debug('foo: %s')"
+        path = self.write_file("mod.py", src)
+        index = FileIndex.load(self.index_path)
+        recursively_examine(self.root, self.options, self.writer, index)
+        index.save()
+        first_output = self.writer.getvalue()
+        self.assertIn("ERROR", first_output)
+
+        index = FileIndex.load(self.index_path)
+        self.assertEquals(1, len(index.files[path]["result"]))
+        index.files[path]["result"][0]["message"] = "cached"
+        writer = StringIO()
+        recursively_examine(self.root, self.options, writer, index)
+        self.assertEquals(first_output.replace(
+            "Logger statement has 1 format specifiers but 0 argument(s).",
+            "cached"), writer.getvalue())
+
+    def test_deleted_paths_are_dropped_on_save(self):
+        kept = self.write_file("pkg/kept.py", "")
+        gone = self.write_file("pkg/gone.py", "")
+        self.write_file("old/mod.py", "")
+        outside = os.path.join(os.path.dirname(self.root), "outside.py")
+        index = FileIndex(self.index_path)
+        recursively_examine(self.root, self.options, self.writer, index)
+        index.files[outside] = index.files[kept]
+        index.save()
+        self.assertIn(gone, index.files)
+
+        os.remove(gone)
+        shutil.rmtree(os.path.join(self.root, "old"))
+        os.rename(os.path.join(self.root, "pkg"),
+                  os.path.join(self.root, "new"))
+        index = FileIndex.load(self.index_path)
+        recursively_examine(self.root, self.options, self.writer, index)
+        index.save()
+        index = FileIndex.load(self.index_path)
+        self.assertEquals(sorted([outside,
+                                  os.path.join(self.root, "new", "kept.py")]),
+                          sorted(index.files))
+        self.assertEquals(sorted([self.root,
+                                  os.path.join(self.root, "new")]),
+                          sorted(index.dirs))
+
+    def test_results_cut_short_by_budget_are_not_cached(self):
+        path = self.write_file("mod.py", "logger.debug('foo: %s')\n")
+        self.options.max_file_time = 1e-9
+        index = FileIndex.load(self.index_path,
+                               index_options_key(self.options,
+                                                 RuleRunner([])))
+        recursively_examine(self.root, self.options, self.writer, index)
+        index.save()
+        self.assertIn("Skipped the rest of the file", self.output)
+        self.assertNotIn(path, index.files)
+
+        self.options.max_file_time = None
+        key = index_options_key(self.options, RuleRunner([]))
+        self.assertNotEqual(index.options_key, key)
+        index = FileIndex.load(self.index_path, key)
+        writer = StringIO()
+        recursively_examine(self.root, self.options, writer, index)
+        self.assertIn("ERROR: Logger statement has 1 format specifiers",
+                      writer.getvalue())
+        self.assertNotIn("Skipped", writer.getvalue())
+
+
+class LibraryApiTests(TempTreeMixin, unittest.TestCase):
+
+    def test_lint_source_clean(self):
+        self.assertEquals([], lint_source("logger.debug('foo: %s', 1)"))
+
+    def test_lint_source_returns_diagnostics(self):
+        diagnostics = lint_source("x = 1\nlogger.debug('foo: %s')",
+                                  filename="mod.py")
+        self.assertEquals(1, len(diagnostics))
+        diagnostic = diagnostics[0]
+        self.assertEquals("mod.py", diagnostic.filename)
+        self.assertEquals(2, diagnostic.line)
+        self.assertEquals(Diagnostic.ERROR, diagnostic.severity)
+        self.assertEquals("logger.debug('foo: %s')", diagnostic.source_line)
+
+    def test_lint_source_respects_config(self):
+        src = "logger.debug('foo: %s' % s)"
+        self.assertEquals(1, len(lint_source(src)))
+        config = Config(ignore_pct_formats=True)
+        self.assertEquals([], lint_source(src, config))
+
+    def test_lint_paths(self):
+        for name, src in [("a.py", "logger.debug('%s')"),
+                          ("b.py", "logger.debug('ok')"),
+                          ("c.py", "logger.info('%s %s', 1)")]:
+            self.write_file(name, src)
+        for jobs in [1, 2]:
+            found = [os.path.basename(d.filename)
+                     for d in lint_paths([self.root], jobs=jobs)]
+            self.assertEquals(["a.py", "c.py"], found)
+
+
+class SymbolIndexTests(CommandLineMixin, unittest.TestCase):
+
+    def test_extract_symbols(self):
+        src = """
+import logging
+from app.log import audit_logger, other as renamed
+from . import sibling
+_log = logging.getLogger(__name__)
+self.logger = getLogger("x")
+log = []
+alias = _log
+def LOGGER(): pass
+"""
+        symbols = extract_symbols(StringIO(src).readline)
+        self.assertEquals(["_log", "logger"], symbols["loggers"])
+        self.assertEquals(["logging", "log", "LOGGER"], symbols["others"])
+        self.assertEquals({"audit_logger": ["app.log", "audit_logger"],
+                           "renamed": ["app.log", "other"],
+                           "sibling": [".", "sibling"]},
+                          symbols["imports"])
+        self.assertEquals({"alias": "_log"}, symbols["aliases"])
+
+    def test_extract_block_symbols(self):
+        src = """
+for log, (a, self.b) in records: pass
+with open(x) as f, lock:
+    pass
+try:
+    pass
+except ValueError as err:
+    pass
+except (IOError, OSError), old:
+    pass
+def f(self, logger, (c, d), e=LOG, *args, **kwargs): pass
+"""
+        symbols = extract_symbols(StringIO(src).readline)
+        self.assertEquals(["log", "a", "b", "f", "err", "old", "f"],
+                          symbols["others"])
+        self.assertEquals([], symbols["loggers"])
+
+    def test_extract_only_module_level_others(self):
+        src = """
+@decorator
+def configure(logger, log=None):
+    for log in records:
+        logger = log
+    import log
+class Handler(object):
+    log = None
+    def __init__(self):
+        self.logger = logging.getLogger()
+        self.log = open(path)
+if debug:
+    log = []
+"""
+        symbols = extract_symbols(StringIO(src).readline)
+        self.assertEquals(["configure", "Handler", "log"], symbols["others"])
+        self.assertEquals(["logger"], symbols["loggers"])
+
+    def test_parameter_doesnt_hide_module_logger(self):
+        path = self.write_file("mod.py",
+                               "from somelib import logger\n"
+                               "def configure(logger):\n"
+                               "    logger.setLevel(1)\n"
+                               "def work(x):\n"
+                               "    logger.debug('value %s %s', x)\n")
+        config = Config(resolve_loggers=True)
+        self.assertEquals([5], [d.line for d in lint_paths([path], config)])
+        self.assertEquals([5], [d.line for d in lint_paths([path])])
+
+    def test_loop_variable_is_not_a_logger(self):
+        path = self.write_file("mod.py", "for log in records:\n"
+                                         "    log.error('%s')\n")
+        config = Config(resolve_loggers=True)
+        self.assertEquals([], list(lint_paths([path], config)))
+        self.assertEquals(1, len(list(lint_paths([path]))))
+
+    def test_file_targets_resolve_loggers_across_modules(self):
+        self.write_file("app/__init__.py", "")
+        self.write_file("app/log.py",
+                        "import logging\n"
+                        "audit_logger = logging.getLogger('audit')\n")
+        views = self.write_file("app/views.py",
+                                "from app.log import audit_logger\n"
+                                "audit_logger.info('%s')\n")
+        config = Config(resolve_loggers=True)
+        found = [(os.path.basename(d.filename), d.line)
+                 for d in lint_paths([views], config)]
+        self.assertEquals([("views.py", 2)], found)
+
+        listing = self.write_file("files.txt", views + "\n")
+        status, output = self.run_main("--resolve-loggers",
+                                       "--files-from", listing)
+        self.assertEquals(1, status)
+        self.assertIn("audit_logger.info('%s')", output)
+
+    def test_lint_paths_resolves_loggers_across_modules(self):
+        self.write_file("app/__init__.py", "")
+        self.write_file("app/log.py",
+                        "import logging\n"
+                        "audit_logger = logging.getLogger('audit')\n"
+                        "log = open('/dev/null')\n")
+        self.write_file("app/views.py",
+                        "from .log import audit_logger, log\n"
+                        "audit_logger.info('%s')\n"
+                        "log.write('%s')\n"
+                        "log.error('%s')\n")
+        config = Config(resolve_loggers=True)
+        found = [(os.path.basename(d.filename), d.line)
+                 for d in lint_paths([self.root], config)]
+        self.assertEquals([("views.py", 2)], found)
+
+        found = [(os.path.basename(d.filename), d.line)
+                 for d in lint_paths([self.root])]
+        self.assertEquals([("views.py", 4)], found)
+
+    def test_entries_only_rebuilt_when_file_changes(self):
+        path = self.write_file("mod.py", "log = getLogger()\n")
+        symbols = SymbolIndex()
+        symbols.update(path, "mod")
+        symbols.entries[path]["symbols"]["loggers"].append("cached")
+        symbols.update(path, "mod")
+        self.assertIn("cached", symbols.logger_names(path))
+
+        with open(path, "a") as f:
+            f.write("x = 1\n")
+        symbols.update(path, "mod")
+        self.assertNotIn("cached", symbols.logger_names(path))
+
+
+class NotebookTests(unittest.TestCase):
+
+    NOTEBOOK = """{
+ "cells": [
+  {"cell_type": "markdown", "source": ["logger.debug('%s')"]},
+  {"cell_type": "code", "outputs": [{"text": "lots of output"}],
+   "source": ["%matplotlib inline\\n", "logger.debug('%s')\\n"]},
+  {"cell_type": "code", "source": "x = 1\\nlogger.info('%s %s', x)"},
+  {"cell_type": "code", "source": ["%%bash\\n", "logger.info('%s')"]}
+ ],
+ "nbformat": 4
+}"""
+
+    def test_iter_notebook_cells(self):
+        cells = list(iter_notebook_cells(StringIO(self.NOTEBOOK)))
+        self.assertEquals([2, 3, 4], [number for number, _ in cells])
+
+    def cell_sources(self):
+        return [(number, "".join(source)) for number, source in
+                iter_notebook_cells(StringIO(self.NOTEBOOK))]
+
+    def test_streamed_cells_match_loaded_cells(self):
+        try:
+            import ijson
+        except ImportError:
+            raise unittest.SkipTest("ijson isn't installed")
+        streamed = self.cell_sources()
+        # A None entry makes "import ijson" fail, forcing json.load.
+        sys.modules["ijson"] = None
+        try:
+            loaded = self.cell_sources()
+        finally:
+            sys.modules["ijson"] = ijson
+        # Both a list of lines and a single string of source.
+        self.assertEquals([(2, "%matplotlib inline\nlogger.debug('%s')\n"),
+                           (3, "x = 1\nlogger.info('%s %s', x)"),
+                           (4, "%%bash\nlogger.info('%s')")], streamed)
+        self.assertEquals(loaded, streamed)
+
+    def test_lint_notebook(self):
+        diagnostics = lint_source(self.NOTEBOOK, filename="nb.ipynb")
+        self.assertEquals([("nb.ipynb:cell 2", 2), ("nb.ipynb:cell 3", 2)],
+                          [(d.filename, d.line) for d in diagnostics])
+
+    def test_cell_that_doesnt_parse(self):
+        notebook = json.dumps({"cells": [
+            {"cell_type": "code", "source": "def f(:\n"},
+            {"cell_type": "code", "source": "logger.info('%s %s', 1)\n"}]})
+        diagnostics = lint_source(notebook, filename="nb.ipynb")
+        self.assertEquals([("nb.ipynb:cell 1", None,
+                            "Couldn't parse cell: EOF in multi-line"
+                            " statement"),
+                           ("nb.ipynb:cell 2", 1,
+                            "Logger statement has 2 format specifiers but"
+                            " 1 argument(s).")],
+                          [(d.filename, d.line, d.message)
+                           for d in diagnostics])
+
+
+class FileIsolationTests(TempTreeMixin, unittest.TestCase):
+
+    def assert_file_error(self, src, message):
+        diagnostics = lint_source(src, filename="bad.py")
+        self.assertEquals([(None, Diagnostic.ERROR, message)],
+                          [(d.line, d.severity, d.message)
+                           for d in diagnostics])
+
+    def test_unbalanced_parens(self):
+        self.assert_file_error("logger.debug('%s', foo(\n",
+                               "Couldn't parse file: EOF in multi-line"
+                               " statement")
+
+    def test_bad_indentation(self):
+        self.assert_file_error("if 1:\n    x = 1\n  y = 2\n",
+                               "Couldn't parse file: unindent does not"
+                               " match any outer indentation level")
+
+    def test_end_of_file_inside_call(self):
+        self.assert_file_error("logger.debug('%s', x]\n",
+                               "Reached the end of the file inside a"
+                               " logger statement.")
+
+    def test_bad_file_does_not_stop_run(self):
+        for name, src in [("a.py", "logger.debug('%s', foo(\n"),
+                          ("b.py", "logger.debug('%s')\n")]:
+            self.write_file(name, src)
+        found = [(os.path.basename(d.filename), d.line)
+                 for d in lint_paths([self.root])]
+        self.assertEquals([("a.py", None), ("b.py", 1)], found)
+
+    def test_size_budget(self):
+        src = "logger.debug('%s')\n" * 10
+        config = Config(max_file_size=len(src) - 1)
+        diagnostics = lint_source(src, config)
+        self.assertEquals([Diagnostic.WARNING],
+                          [d.severity for d in diagnostics])
+        self.assertIn("larger than", diagnostics[0].message)
+        diagnostics = lint_source(src, Config(max_file_size=len(src)))
+        self.assertEquals([Diagnostic.ERROR] * 10,
+                          [d.severity for d in diagnostics])
+
+    def test_time_budget(self):
+        config = Config(max_file_time=1e-9)
+        diagnostics = lint_source("logger.debug('%s')\n", config)
+        self.assertEquals(1, len(diagnostics))
+        self.assertIn("took longer than", diagnostics[0].message)
+        self.assertEquals([], lint_source("logger.debug('%s')\n",
+                                          Config(max_file_time=1e-9,
+                                                 no_warnings=True)))
+
+
+class EvalCallRule(Rule):
+
+    NAME = "eval-call"
+
+    EVENTS = ("call",)
+
+    def process_call(self, call):
+        if call.name == "eval":
+            self.report(Diagnostic.WARNING, "eval() call", call.name_token)
+
+
+class TodoCommentRule(Rule):
+
+    NAME = "todo-comment"
+
+    EVENTS = ("token",)
+
+    def process_token(self, token):
+        if token[0] == tokenize.COMMENT and "TODO" in token[1]:
+            self.report(Diagnostic.ERROR, "TODO comment", token)
+
+
+class BrokenRule(Rule):
+
+    NAME = "broken"
+
+    EVENTS = ("tokens",)
+
+    def process_tokens(self, tokens):
+        [][0]
+
+
+class RuleTests(unittest.TestCase):
+
+    SRC = "eval('x')  # TODO\nlogger.debug('%s')\n"
+
+    def lint(self, rules, **config):
+        runner = RuleRunner(rules)
+        diagnostics = lint_filelike("mod.py", StringIO(self.SRC),
+                                    Config(**config), runner=runner)
+        return runner, [d.message for d in diagnostics]
+
+    def test_rules_share_one_pass(self):
+        runner, messages = self.lint([LoggerFormatRule,
+                                      EvalCallRule,
+                                      TodoCommentRule])
+        self.assertEquals(["Logger statement has 1 format specifiers but"
+                           " 0 argument(s).",
+                           "eval() call",
+                           "TODO comment"], messages)
+        self.assertEquals(set(["logger-format", "eval-call",
+                               "todo-comment", "(finding calls)"]),
+                          set(runner.stats))
+        self.assertIn("eval-call", runner.format_stats())
+
+    def test_no_call_finding_without_call_rules(self):
+        runner, messages = self.lint([TodoCommentRule])
+        self.assertEquals(["TODO comment"], messages)
+        self.assertEquals(["todo-comment"], list(runner.stats))
+
+    def test_broken_rule_doesnt_stop_the_others(self):
+        runner = RuleRunner([BrokenRule, EvalCallRule])
+        diagnostics = lint_filelike("mod.py", StringIO(self.SRC), Config(),
+                                    runner=runner)
+        self.assertEquals([("broken", None, Diagnostic.ERROR),
+                           ("eval-call", 1, Diagnostic.WARNING)],
+                          [(d.rule, d.line, d.severity)
+                           for d in diagnostics])
+        self.assertEquals("Rule broken failed: IndexError('list index out"
+                          " of range',)", diagnostics[0].message)
+
+    def test_rules_from_config(self):
+        spec = "%s:EvalCallRule" % __name__
+        self.assertIs(EvalCallRule, load_rule(spec))
+        config = Config(rules=[spec], disabled_rules=["logger-format"])
+        self.assertEquals(["eval-call"],
+                          RuleRunner.from_options(config).names)
+        self.assertEquals(["eval() call"],
+                          [d.message for d in lint_source(self.SRC, config)])
+
+    def test_find_calls(self):
+        src = ("def f(a, b): pass\n"
+               "if (x): a.b.c(1, g(2, 3), [4, 5],)\n")
+        tokens = list(tokenize.generate_tokens(StringIO(src).readline))
+        calls = find_calls(tokens)
+        self.assertEquals(["a.b.c", "g"], [call.name for call in calls])
+        self.assertEquals([["1"], ["g", "(", "2", ",", "3", ")"],
+                           ["[", "4", ",", "5", "]"]],
+                          [[token[1] for token in argument]
+                           for argument in calls[0].arguments])
+
+
+class FilesFromTests(CommandLineMixin, unittest.TestCase):
+
+    def test_iter_file_list_newlines(self):
+        paths = iter_file_list(StringIO("a.py\nb c.py\r\n\nd.py"),
+                               chunk_size=3)
+        self.assertEquals(["a.py", "b c.py", "d.py"], list(paths))
+
+    def test_iter_file_list_nul_separated(self):
+        paths = iter_file_list(StringIO("a.py\0b\nc.py\0d.py\0"),
+                               chunk_size=4)
+        self.assertEquals(["a.py", "b\nc.py", "d.py"], list(paths))
+
+    def test_files_from_dedups_and_sets_exit_status(self):
+        good = self.write_file("good.py", "logger.debug('%s', 1)\n")
+        bad = self.write_file("bad.py", "logger.debug('%s')\n")
+        listing = self.write_file("files.txt",
+                                  "%s\n%s\n%s\n" % (good, bad, bad))
+
+        status, output = self.run_main("--files-from", listing)
+        self.assertEquals(1, status)
+        self.assertEquals(1, output.count("ERROR"))
+
+        status, output = self.run_main(good)
+        self.assertEquals((0, ""), (status, output))
+
+        status, output = self.run_main("--files-from", listing,
+                                       os.path.join(self.root, ".", "bad.py"))
+        self.assertEquals(1, output.count("ERROR"))
+
+    def test_missing_file_list_is_bad_usage(self):
+        missing = os.path.join(self.root, "missing.txt")
+        status, output = self.run_main("--files-from", missing)
+        self.assertEquals((2, ""), (status, output))
+        self.assertIn("Can't read --files-from %s" % missing,
+                      self.stderr.getvalue())
+
+    def test_missing_listed_path_is_an_error(self):
+        missing = os.path.join(self.root, "missing.py")
+        listing = self.write_file("files.txt", missing + "\n")
+        status, output = self.run_main("--files-from", listing)
+        self.assertEquals(1, status)
+        self.assertIn("No such file or directory", output)
+        self.assertIn(missing, output)
+
+        status, output = self.run_main("--summary", "--files-from", listing)
+        self.assertEquals(1, status)
+        self.assertIn("(file)", output)
+
+
+# (source, [message of each expected diagnostic])
+ARGUMENT_CORPUS = [
+    ("logger.error('failed %s', x, exc_info=True)", []),
+    ("logger.error('failed', exc_info=True)", []),
+    ("logger.info('a %s', x, extra={'user': u, 'id': i})", []),
+    ("logger.info('a %s', x, stack_info=True, stacklevel=2)", []),
+    ("logger.info('a %s %s', x, exc_info=True)",
+     ["Logger statement has 2 format specifiers but 1 argument(s)."]),
+    ("logger.info('a', x, exc_info=True)",
+     ["Logger statement has 0 format specifiers but 1 argument(s)."]),
+    ("logger.info('a %s', x, **kwargs)", []),
+    ("logger.info('a %s %s', *args)",
+     ["Can't count arguments passed with *args"]),
+    ("logger.info('a %s', x, *rest)",
+     ["Can't count arguments passed with *args"]),
+    ("logger.info('a %s', f(y=1))", []),
+    ("logger.info('a %s', lambda y=1: y)", []),
+    ("logger.info('a %s', {1: 2, 3: 4})", []),
+    ("logger.info('a %s', [1, 2])", []),
+    ("logger.info('a %s %s', (1, 2))",
+     ["Logger statement has 2 format specifiers but 1 argument(s)."]),
+    ("logger.info('%(a)s %(b)s', {'a': 1, 'b': 2})", []),
+    ("logger.info('%(a)s %(b)s', mapping)", []),
+    ("logger.info('%(a)s %(a)s', mapping, exc_info=1)", []),
+    ("logger.info('%(a)s' ' %(b)s', {'a': 1})",
+     ["Logger statement format specifier key(s) b missing from the"
+      " mapping argument."]),
+    ("logger.info('%(a)s %(b)s', a, b)",
+     ["Logger statement uses %(name)s format specifiers but 2"
+      " argument(s) instead of one mapping."]),
+    ("logger.info('%(a)s %s', {'a': 1})",
+     ["Logger statement mixes %(name)s and positional format"
+      " specifiers."]),
+    ("logger.info('100%% %(a)s', {'a': 1})", []),
+    ("logger.error('failed %s', x,  # why\n"
+     "             exc_info=True)", []),
+    ("logger.error('failed %s',\n"
+     "             x,  # c\n"
+     "             )", []),
+    ("logger.error('failed %s %s', x,  # c\n"
+     "             y)", []),
+    ("logger.error('failed %s', x,  # c\n"
+     "             y)",
+     ["Logger statement has 1 format specifiers but 2 argument(s)."]),
+]
+
+
+class ArgumentCorpusTests(unittest.TestCase):
+
+    def test_corpus(self):
+        for src, expected in ARGUMENT_CORPUS:
+            found = [d.message for d in lint_source(src)]
+            self.assertEquals(expected, found, src)
+
+
+# Calls the fast engine checks itself mixed with ones it has to hand to
+# the state machine.
+FAST_ENGINE_SOURCE = r"""
+logger.debug('%s')  # logger.debug('%s')
+s = "logger.debug('%s')"
+t = '''
+logger.debug('%s')
+'''
+logger.debug('a' 'b %s')
+logger.debug('a %s' % x); logger.info('%s')
+logger.info('x'); logger.info('%s %s', 1)
+logger.info("%s",
+            1, 2)
+logger.info(u'%s', f(a, (b, c)), [1,
+    2])
+logger.info(r'%s\'', 1, 2)
+logger.info('%s' * 2, 1)
+logger . debug ( '%s' , 1 , 2 )
+x = foo(logger.debug('%s' % y),
+        2)
+logger.info('%s', a == b, c=1)
+logger.info('%(x)s', {'x': 1}, 2)
+logger.info('''%s''', 1, 2)
+logger.info('%s', "a,b", 'c)d', '#', 1)
+logger.info(msg, 1)
+logger.info(
+    '%s')
+logger.info('%s', 1, \
+            2)
+if x: logger.info('%s %s', 1)
+def f():
+    logger.error('{0}'.format(x), 1)
+    logger.warn('%s' + 'x')
+logger.info('%s %s', 1  # c
+    )
+logger
+"""
+
+
+class FastEngineTests(unittest.TestCase):
+
+    def assert_same_findings(self, filename, text):
+        fast = lint_filelike(filename, StringIO(text), Config(engine="fast"))
+        token = lint_filelike(filename, StringIO(text), Config())
+        self.assertEquals([d.as_dict() for d in token],
+                          [d.as_dict() for d in fast])
+        return fast
+
+    def test_same_findings_as_token_engine(self):
+        diagnostics = self.assert_same_findings("fast.py",
+                                                FAST_ENGINE_SOURCE)
+        self.assertEquals(19, len(diagnostics))
+        for src, _ in ARGUMENT_CORPUS:
+            self.assert_same_findings("corpus.py", src)
+
+    def test_same_findings_for_broken_files(self):
+        for src in ["logger.debug('%s')\nx = (\n",
+                    "x = (\n",
+                    "if 1:\n    logger.debug('%s')\n  y = 2\n",
+                    "logger.debug('%s')\nx = '''\n",
+                    "x = = 1\nlogger.debug('%s')\n",
+                    "logger.debug('%s')\0\n"]:
+            diagnostics = self.assert_same_findings("broken.py", src)
+            self.assertEquals(1, len(diagnostics))
+
+    def test_same_findings_on_project_files(self):
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in ["example.py", "loglint.py", "tests.py"]:
+            with open(os.path.join(here, name)) as f:
+                self.assert_same_findings(name, f.read())
+
+    def test_engine_option_picks_rule(self):
+        self.assertEquals([FastLoggerFormatRule],
+                          RuleRunner.from_options(
+                              Config(engine="fast")).rule_classes)
+        self.assertEquals([LoggerFormatRule],
+                          RuleRunner.from_options(Config()).rule_classes)
+
+
+class SummaryTests(CommandLineMixin, unittest.TestCase):
+
+    FILES = [("CODEOWNERS", "* @all\n/pkg/ @pkg-team  # the package\n"),
+             ("script.py", "x = 1\nlogger.debug('%s' % x)\n"),
+             ("pkg/__init__.py", ""),
+             ("pkg/sub/__init__.py", ""),
+             ("pkg/sub/mod.py", "logger.debug('%s')\n"
+                                "logger.info('%s %s', 1, *a)\n"
+                                "logger.info('ok')\n")]
+
+    def setUp(self):
+        super(SummaryTests, self).setUp()
+        for name, contents in self.FILES:
+            self.write_file(name, contents)
+        self.owners = CodeOwners.load(os.path.join(self.root, "CODEOWNERS"))
+
+    def test_owners(self):
+        self.assertEquals(["@all"], self.owners.owners(
+            os.path.join(self.root, "script.py")))
+        self.assertEquals(["@pkg-team"], self.owners.owners(
+            os.path.join(self.root, "pkg", "sub", "mod.py")))
+        self.assertEquals([], self.owners.owners("/elsewhere.py"))
+
+    def test_find_owners_above_the_target(self):
+        owners = CodeOwners.find(os.path.join(self.root, "pkg", "sub",
+                                              "mod.py"))
+        self.assertEquals(self.owners.root, owners.root)
+        self.assertEquals(self.owners.rules, owners.rules)
+
+    def test_counts(self):
+        summary = summarize_paths([self.root], owners=self.owners)
+        data = summary.as_dict()
+        self.assertEquals((4, 5, 3), (data["files"],
+                                      data["lines"],
+                                      data["findings"]))
+        self.assertEquals(600.0, data["findings_per_kloc"])
+        self.assertEquals({"error": 2, "warning": 1}, data["by_severity"])
+        self.assertEquals({"logger-format": 3}, data["by_rule"])
+        self.assertEquals({"files": 3, "lines": 3, "findings": 2,
+                           "findings_per_kloc": 2000.0 / 3},
+                          data["by_package"]["pkg"])
+        self.assertEquals(1, data["by_package"]["(none)"]["findings"])
+        self.assertEquals(2, data["by_owner"]["@pkg-team"]["findings"])
+        self.assertEquals(1, data["by_owner"]["@all"]["findings"])
+        self.assertIn("logger-format", summary.format())
+
+    def test_parallel_summary_matches(self):
+        serial = summarize_paths([self.root], owners=self.owners)
+        parallel = summarize_paths([self.root], jobs=2, owners=self.owners,
+                                   batch_size=1)
+        self.assertEquals(serial.as_dict(), parallel.as_dict())
+
+    def test_file_problems_have_no_rule(self):
+        summary = Summary()
+        for diagnostic in lint_source("logger.debug('%s',\n"):
+            summary.add_diagnostic(diagnostic)
+        summary.add_file("broken.py", 1)
+        self.assertEquals({Summary.FILE_RULE: 1}, summary.by_rule)
+
+    def test_command_line(self):
+        json_path = os.path.join(self.root, "summary.json")
+        status, output = self.run_main(
+            "--summary-json", json_path,
+            "--owners", os.path.join(self.root, "CODEOWNERS"),
+            self.root)
+        self.assertEquals(1, status)
+        self.assertNotIn("ERROR", output)
+        with open(json_path) as f:
+            data = json.load(f)
+        self.assertEquals(summarize_paths([self.root], owners=self.owners)
+                          .as_dict(), data)
+
+    def test_jobs_match_a_serial_run(self):
+        for args in [("--summary",), ()]:
+            serial = self.run_main(*args + (self.root,))
+            pooled = self.run_main(*args + ("--jobs", "2", self.root))
+            self.assertEquals(serial, pooled)
+            self.assertEquals(1, pooled[0])
+
+    def test_jobs_with_stdin_and_missing_paths(self):
+        missing = os.path.join(self.root, "missing.py")
+        sys.stdin = StringIO("logger.info('%s')\n")
+        try:
+            status, output = self.run_main("--jobs", "2", "-", missing,
+                                           os.path.join(self.root, "pkg"))
+        finally:
+            sys.stdin = sys.__stdin__
+        self.assertEquals(1, status)
+        self.assertIn("of '<stdin>'", output)
+        self.assertIn("In '%s'" % missing, output)
+        self.assertIn("mod.py", output)
+
+    def test_jobs_with_index_is_bad_usage(self):
+        status, _ = self.run_main("--jobs", "2", "--index",
+                                  os.path.join(self.root, "index.json"),
+                                  self.root)
+        self.assertEquals(2, status)
+        self.assertIn("Can't use --jobs", self.stderr.getvalue())
+
+
+def lineno():
+    return sys._getframe(1).f_lineno
+
+
+class RuntimeHookTests(TempTreeMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(RuntimeHookTests, self).setUp()
+        self.logger = logging.getLogger("loglint.tests.runtime")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.hook = RuntimeHook(sample_every=1).install()
+
+    def tearDown(self):
+        self.hook.uninstall()
+        super(RuntimeHookTests, self).tearDown()
+
+    def site(self, line):
+        for site in self.hook.report()["sites"]:
+            if site["line"] == line:
+                return site
+
+    def test_records_call_sites(self):
+        for _ in range(3):
+            debug_line = lineno() + 1
+            self.logger.debug("off %s", 1)
+            info_line = lineno() + 1
+            self.logger.info("short %s %s", 1)
+        warning_line = lineno() + 1
+        self.logger.warning("ok %(a)s", {"a": 1})
+
+        debug_site = self.site(debug_line)
+        self.assertEquals(3, debug_site["estimated_disabled_calls"])
+        self.assertEquals(0, debug_site["mismatches"])
+
+        info_site = self.site(info_line)
+        self.assertEquals(3, info_site["estimated_calls"])
+        self.assertEquals(0, info_site["estimated_disabled_calls"])
+        self.assertEquals(3, info_site["mismatches"])
+        self.assertEquals(3, info_site["format_errors"])
+
+        self.assertEquals(0, self.site(warning_line)["mismatches"])
+
+    def test_records_keep_their_call_site(self):
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        self.logger.addHandler(handler)
+        try:
+            line = lineno() + 1
+            self.logger.info("x %s", 1)
+        finally:
+            self.logger.removeHandler(handler)
+        self.assertEquals([("tests.py", line,
+                            "test_records_keep_their_call_site")],
+                          [(record.filename, record.lineno, record.funcName)
+                           for record in records])
+        self.assertEquals(1, self.site(line)["sampled_calls"])
+
+    def test_loggers_made_after_install(self):
+        logger = logging.getLogger("loglint.tests.runtime.later")
+        line = lineno() + 1
+        logger.warning("late %s")
+        self.assertEquals(1, self.site(line)["mismatches"])
+        self.hook.uninstall()
+        self.assertNotIn(self.hook, logger.filters)
+
+    def test_exception_is_attributed_to_caller(self):
+        try:
+            raise ValueError()
+        except ValueError:
+            line = lineno() + 1
+            self.logger.exception("failed")
+        self.assertEquals(1, self.site(line)["sampled_calls"])
+
+    def test_sampling(self):
+        self.hook.uninstall()
+        self.hook = RuntimeHook(sample_every=10).install()
+        for _ in range(100):
+            line = lineno() + 1
+            self.logger.info("x")
+        site = self.site(line)
+        self.assertEquals(10, site["sampled_calls"])
+        self.assertEquals(100, site["estimated_calls"])
+
+    def test_report_annotates_diagnostics(self):
+        line = lineno() + 1
+        self.logger.info("x %s")
+        path = os.path.join(self.root, "report.json")
+        self.hook.dump(path)
+        with open(path) as f:
+            filename = json.load(f)["sites"][0]["filename"]
+        writer = RuntimeReportWriter(StringIO(), load_runtime_report(path))
+        writer.add_diagnostic(Diagnostic(filename, line,
+                                         Diagnostic.ERROR, "msg", ""))
+        self.assertIn("runtime: ~1 calls", writer.writer.getvalue())
+
+
 if __name__ == '__main__':
     unittest.main()